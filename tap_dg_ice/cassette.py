@@ -0,0 +1,147 @@
+"""Record-and-replay cassettes of a stream's network traffic."""
+
+import atexit
+import gzip
+import json
+import zlib
+import hashlib
+import logging
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional
+
+import requests
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+class Cassette:
+    """Gzipped JSON-lines file holding every exchange made by one stream.
+
+    Each line is `{"kind", "key", "request", "response"}`. In record mode the
+    file is rewritten from scratch by the first exchange and appended to after
+    each `close`, which streams call at the end of every sync so an abruptly
+    killed process loses at most the stream being synced. In replay mode
+    responses are served in the order they were recorded for a given key, the
+    last one repeating once the recorded ones are used up.
+    """
+
+    def __init__(self, path: Path, mode: str) -> None:
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'.")
+        self.path = Path(path)
+        self.mode = mode
+        self._entries: Dict[str, Deque[Any]] = defaultdict(deque)
+        self._file = None
+        self._started = False
+        if mode == REPLAY:
+            self._load()
+
+    @classmethod
+    def for_stream(cls, config: dict, stream_name: str) -> Optional["Cassette"]:
+        """Return the stream's cassette if `cassette_mode` is configured."""
+        mode = config.get("cassette_mode")
+        if not mode:
+            return None
+        directory = Path(config.get("cassette_dir") or "cassettes")
+        return cls(directory / f"{stream_name}.jsonl.gz", mode)
+
+    @property
+    def replaying(self) -> bool:
+        """Return True when responses come from the cassette, not the network."""
+        return self.mode == REPLAY
+
+    @staticmethod
+    def key(kind: str, request: Any) -> str:
+        """Return a stable key for a request payload."""
+        payload = json.dumps([kind, request], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def record(self, kind: str, request: Any, response: Any) -> None:
+        """Append one exchange to the cassette."""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            file_mode = "at" if self._started else "wt"
+            self._file = gzip.open(self.path, file_mode, encoding="utf-8")
+            if not self._started:
+                atexit.register(self.close)
+            self._started = True
+        entry = {
+            "kind": kind,
+            "key": self.key(kind, request),
+            "request": request,
+            "response": response,
+        }
+        self._file.write(json.dumps(entry, default=str) + "\n")
+
+    def close(self) -> None:
+        """Finish the gzip stream on disk; a later `record` appends to it."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def replay(self, kind: str, request: Any) -> Any:
+        """Return the recorded response for `request`."""
+        responses = self._entries.get(self.key(kind, request))
+        if not responses:
+            raise CassetteMissError(f"No recorded {kind} response for {request!r}")
+        if len(responses) > 1:
+            return responses.popleft()
+        return responses[0]
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as cassette_file:
+            try:
+                for line in cassette_file:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry["response"])
+            except (EOFError, zlib.error, ValueError) as err:
+                logging.warning(
+                    f"Cassette {self.path} is truncated, replaying the "
+                    f"exchanges before the damage: {err}"
+                )
+
+    def transmit(
+        self,
+        session: requests.Session,
+        prepared_request: requests.PreparedRequest,
+        **kwargs,
+    ) -> requests.Response:
+        """Send an HTTP request, recording or replaying it."""
+        body = prepared_request.body
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        request = {
+            "method": prepared_request.method,
+            "url": prepared_request.url,
+            "body": body,
+        }
+
+        if self.replaying:
+            recorded = self.replay("http", request)
+            response = requests.Response()
+            response.status_code = recorded["status_code"]
+            response.headers.update(recorded["headers"])
+            response._content = recorded["body"].encode("utf-8")
+            response.encoding = "utf-8"
+            response.url = recorded["url"]
+            response.request = prepared_request
+            return response
+
+        response = session.send(prepared_request, **kwargs)
+        self.record(
+            "http",
+            request,
+            {
+                "status_code": response.status_code,
+                "headers": dict(response.headers),
+                "body": response.text,
+                "url": response.url,
+            },
+        )
+        return response
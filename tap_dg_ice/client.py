@@ -1,18 +1,290 @@
 """GraphQL client handling, including TapDgIceStream base class."""
 
-import requests, backoff, logging
+import json
+import requests, logging
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, List, Iterable, cast
+from typing import Any, Dict, Optional, Set, Union, List, Iterable, cast
+from urllib.parse import urlparse
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
 from singer_sdk.streams import GraphQLStream, RESTStream
 
+from tap_dg_ice.cassette import Cassette
+from tap_dg_ice.profiling import profiler
+from tap_dg_ice.request_engine import RateLimiter, RequestEngine
+
 RESULTS_PER_PAGE = 1000
+INDEXING_STATUS_QUERY = "{ _meta { block { number timestamp } } }"
+
+
+class IndexingStatusCache:
+    """Latest indexed block per subgraph URL, fetched at most once per run."""
+
+    def __init__(self) -> None:
+        self._blocks: Dict[str, Optional[dict]] = {}
+
+    def clear(self) -> None:
+        """Forget all cached blocks so the next lookup hits the subgraph."""
+        self._blocks.clear()
+
+    def get(
+        self,
+        url: str,
+        engine: RequestEngine,
+        session: requests.Session,
+        headers: dict,
+    ) -> Optional[dict]:
+        """Return `{"number": ..., "timestamp": ...}` for `url`, or None if unknown."""
+        if url not in self._blocks:
+            self._blocks[url] = self._fetch(url, engine, session, headers)
+        return self._blocks[url]
+
+    @staticmethod
+    def _fetch(
+        url: str, engine: RequestEngine, session: requests.Session, headers: dict
+    ) -> Optional[dict]:
+        request = requests.Request(
+            "POST", url, json={"query": INDEXING_STATUS_QUERY}, headers=headers
+        )
+        try:
+            response = engine.send(session, session.prepare_request(request))
+            return response.json()["data"]["_meta"]["block"]
+        except Exception as err:
+            logging.warning(f"Could not fetch indexing status for {url}: {err}")
+            return None
+
+
+indexing_status = IndexingStatusCache()
+rate_limiters: Dict[str, RateLimiter] = {}
+
+
+class StreamMetricsMixin:
+    """Time the records a stream writes and fingerprint them for follow mode.
+
+    The `emit` span covers the SDK's record write (selection, type conforming
+    and serialization). While `written_fingerprints` is a set, a hash of each
+    written record is added to it, which lets follow mode tell new or changed
+    rows from rows that were merely read again.
+    """
+
+    written_fingerprints: Optional[Set[int]] = None
+
+    def _write_record_message(self, record: dict) -> None:
+        with profiler.span(self.name, "emit"):
+            super()._write_record_message(record)
+        if self.written_fingerprints is not None:
+            self.written_fingerprints.add(
+                hash(json.dumps(record, sort_keys=True, default=str))
+            )
+
+
+class RequestEngineMixin:
+    """Route the SDK's `_request_with_backoff` through a shared `RequestEngine`.
+
+    Class attributes give each stream family its default retry budget; the
+    `request_*` tap settings override them for every stream at once.
+    """
+
+    request_max_tries = 7
+    request_backoff_factor = 2
+
+    @property
+    def cassette(self) -> Optional[Cassette]:
+        """Return the stream's record/replay cassette, if one is configured."""
+        if not hasattr(self, "_cassette"):
+            self._cassette = Cassette.for_stream(self.config, self.name)
+        return self._cassette
+
+    def close_cassette(self) -> None:
+        """Flush the stream's cassette to disk at the end of a sync."""
+        if self.cassette:
+            self.cassette.close()
+
+    @property
+    def request_engine(self) -> RequestEngine:
+        """Return this stream's request engine, built once from the tap config."""
+        if getattr(self, "_request_engine", None) is None:
+            config = self.config
+            rate_limiter = None
+            if config.get("requests_per_second"):
+                host = urlparse(self.url_base).netloc
+                if host not in rate_limiters:
+                    rate_limiters[host] = RateLimiter(config["requests_per_second"])
+                rate_limiter = rate_limiters[host]
+            self._request_engine = RequestEngine(
+                max_tries=config.get("request_max_tries") or self.request_max_tries,
+                factor=config.get("request_backoff_factor") or self.request_backoff_factor,
+                max_time=config.get("request_max_time"),
+                timeout=config.get("request_timeout") or (10, 300),
+                rate_limiter=rate_limiter,
+                logger=self.logger,
+                cassette=self.cassette,
+            )
+        return self._request_engine
 
-class TapDgIceStream(GraphQLStream):
+    def _request_with_backoff(
+        self, prepared_request, context: Optional[dict]
+    ) -> requests.Response:
+        def log_request_metrics(prepared_request, response, elapsed):
+            if not self._LOG_REQUEST_METRICS:
+                return
+            extra_tags = {}
+            if self._LOG_REQUEST_METRIC_URLS:
+                extra_tags["url"] = cast(str, prepared_request.path_url)
+            self._write_request_duration_log(
+                endpoint=self.path,
+                response=response,
+                context=context,
+                extra_tags=extra_tags,
+            )
+
+        with profiler.span(self.name, "fetch"):
+            return self.request_engine.send(
+                self.requests_session, prepared_request, on_response=log_request_metrics
+            )
+
+
+class TapDgIceGraphQLStream(
+    StreamMetricsMixin, RequestEngineMixin, GraphQLStream
+):
+    """Shared behaviour of the tap's GraphQL streams.
+
+    The query is generated from `object_returned`, `query_variables`,
+    `query_arguments` and the selected schema properties, so deselected
+    catalog fields are never requested from the subgraph. Primary keys, the
+    replication key and `query_required_properties` are always fetched;
+    `enriched_properties` are filled in by the tap and never queried.
+    """
+
+    query_variables = ""
+    query_arguments = ""
+    query_required_properties: List[str] = []
+    enriched_properties: List[str] = []
+    poll_skipped = False
+
+    @property
+    def query(self) -> str:
+        """Return the GraphQL query for the selected properties."""
+        return (
+            f"query ({self.query_variables}) {{ "
+            f"{self.object_returned}({self.query_arguments}) "
+            f"{{ {self.selection_set(self.schema['properties'])} }} }}"
+        )
+
+    def selection_set(
+        self, properties: dict, breadcrumb: tuple = (), select_all: bool = False
+    ) -> str:
+        """Return the GraphQL fields for the selected `properties`.
+
+        Required top-level properties are fetched with all their nested fields.
+        """
+        required = set(self.primary_keys or []) | set(self.query_required_properties)
+        if self.replication_key:
+            required.add(self.replication_key)
+
+        fields = []
+        for name, schema in properties.items():
+            property_breadcrumb = breadcrumb + ("properties", name)
+            property_select_all = select_all
+            if not breadcrumb:
+                if name in self.enriched_properties:
+                    continue
+                if name in required:
+                    property_select_all = True
+                elif not self.mask[property_breadcrumb]:
+                    continue
+            elif not select_all and not self.mask[property_breadcrumb]:
+                continue
+
+            if schema.get("properties"):
+                nested = self.selection_set(
+                    schema["properties"], property_breadcrumb, property_select_all
+                )
+                if nested:
+                    fields.append(f"{name} {{ {nested} }}")
+            else:
+                fields.append(name)
+        return " ".join(fields)
+
+    def is_property_selected(self, name: str) -> bool:
+        """Return True if the top-level property `name` is selected."""
+        return bool(self.mask[("properties", name)])
+
+    @property
+    def http_headers(self) -> dict:
+        """Return the http headers needed."""
+        headers = {}
+        if "user_agent" in self.config:
+            headers["User-Agent"] = self.config.get("user_agent")
+        # If not using an authenticator, you may also provide inline auth headers:
+        # headers["Private-Token"] = self.config.get("auth_token")
+        return headers
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Request records, skipping the poll if the subgraph has not advanced.
+
+        The subgraph's latest indexed block is stored in the stream state after
+        every complete sync. When the subgraph has indexed fewer than
+        `subgraph_min_block_advance` blocks (default 1) since then, the query
+        is not sent. With the default this only skips stalled or lagging
+        subgraphs; on a live chain a larger value trades freshness for fewer
+        queries. The check is off while recording or replaying a cassette so
+        that replayed runs see exactly the recorded queries. `poll_skipped`
+        tells whether the last call skipped the query.
+        """
+        self.poll_skipped = False
+        if not self.config.get("skip_unchanged_subgraphs", True) or self.cassette:
+            yield from super().request_records(context)
+            return
+
+        url = self.url_base
+        block = indexing_status.get(
+            url, self.request_engine, self.requests_session, self.http_headers
+        )
+        state = self.get_context_state(context)
+        indexed_blocks = state.setdefault("indexed_blocks", {})
+        min_advance = self.config.get("subgraph_min_block_advance") or 1
+        if block and url in indexed_blocks:
+            advance = int(block["number"]) - indexed_blocks[url]
+            if advance < min_advance:
+                self.logger.info(
+                    f"(stream: {self.name}) Subgraph advanced {advance} blocks "
+                    f"to {block['number']}, skipping poll."
+                )
+                self.poll_skipped = True
+                return
+
+        yield from super().request_records(context)
+        if block:
+            indexed_blocks[url] = int(block["number"])
+
+    def parse_response(self, response: requests.Response) -> Iterable[dict]:
+        """Return the rows of `parse_rows`, timing the parsing for profiling."""
+        return profiler.iterate(self.name, "parse", self.parse_rows(response))
+
+    def parse_rows(self, response: requests.Response) -> Iterable[dict]:
+        """Parse the response and return an iterator of result rows."""
+        raise NotImplementedError
+
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        """Return post-processed records, timing `post_process` for profiling."""
+        try:
+            for record in self.request_records(context):
+                with profiler.span(self.name, "post_process"):
+                    transformed_record = self.post_process(record, context)
+                if transformed_record is None:
+                    # Record filtered out during post_process()
+                    continue
+                yield transformed_record
+        finally:
+            self.close_cassette()
+
+
+class TapDgIceStream(TapDgIceGraphQLStream):
     """TapDgIce stream class."""
 
+    query_variables = "$timestamp: Int!"
     is_timestamp_replication_key = True
     latest_timestamp = None
     results_count = None
@@ -26,17 +298,7 @@ class TapDgIceStream(GraphQLStream):
         """Return the API URL root, configurable via tap settings."""
         return self.config["api_url"]
 
-    @property
-    def http_headers(self) -> dict:
-        """Return the http headers needed."""
-        headers = {}
-        if "user_agent" in self.config:
-            headers["User-Agent"] = self.config.get("user_agent")
-        # If not using an authenticator, you may also provide inline auth headers:
-        # headers["Private-Token"] = self.config.get("auth_token")
-        return headers
-
-    def parse_response(self, response) -> Iterable[dict]:
+    def parse_rows(self, response) -> Iterable[dict]:
         """Parse the response and return an iterator of result rows."""
         resp_json = response.json()
         try:
@@ -86,48 +348,8 @@ class TapDgIceStream(GraphQLStream):
 
         return self.latest_timestamp
 
-    
-    @backoff.on_exception(
-        backoff.expo,
-        (requests.exceptions.RequestException),
-        max_tries=7,
-        factor=2,
-    )
-    def _request_with_backoff(
-        self, prepared_request, context: Optional[dict]
-    ) -> requests.Response:
-
-        response = self.requests_session.send(prepared_request)
-        if self._LOG_REQUEST_METRICS:
-            extra_tags = {}
-            if self._LOG_REQUEST_METRIC_URLS:
-                extra_tags["url"] = cast(str, prepared_request.path_url)
-            self._write_request_duration_log(
-                endpoint=self.path,
-                response=response,
-                context=context,
-                extra_tags=extra_tags,
-            )
-        if response.status_code in [401, 403]:
-            self.logger.info("Failed request for {}".format(prepared_request.url))
-            self.logger.info(
-                f"Reason: {response.status_code} - {str(response.content)}"
-            )
-            raise RuntimeError(
-                "Requested resource was unauthorized, forbidden, or not found."
-            )
-        elif response.status_code >= 400:
-            raise RuntimeError(
-                f"Error making request to API: {prepared_request.url} "
-                f"[{response.status_code} - {str(response.content)}]".replace(
-                    "\\n", "\n"
-                )
-            )
-        self.logger.debug("Response received successfully.")
-        return response
-
 
-class TapDgIceStreamByKey(GraphQLStream):
+class TapDgIceStreamByKey(TapDgIceGraphQLStream):
     """TapDgIce stream class."""
 
     latest_timestamp = None
@@ -135,17 +357,14 @@ class TapDgIceStreamByKey(GraphQLStream):
     last_key = ''
     onlyonerow = False
     incremental_key = 'id'
-
+    query_variables = "$key: String!"
 
     @property
-    def http_headers(self) -> dict:
-        """Return the http headers needed."""
-        headers = {}
-        if "user_agent" in self.config:
-            headers["User-Agent"] = self.config.get("user_agent")
-        return headers
+    def query_required_properties(self) -> List[str]:
+        """Always fetch the pagination key."""
+        return [self.incremental_key]
 
-    def parse_response(self, response) -> Iterable[dict]:
+    def parse_rows(self, response) -> Iterable[dict]:
         """Parse the response and return an iterator of result rows."""
         resp_json = response.json()
         try:
@@ -173,85 +392,10 @@ class TapDgIceStreamByKey(GraphQLStream):
 
         return self.last_key
 
-    
-    @backoff.on_exception(
-        backoff.expo,
-        (requests.exceptions.RequestException),
-        max_tries=7,
-        factor=2,
-    )
-    def _request_with_backoff(
-        self, prepared_request, context: Optional[dict]
-    ) -> requests.Response:
-
-        response = self.requests_session.send(prepared_request)
-        if self._LOG_REQUEST_METRICS:
-            extra_tags = {}
-            if self._LOG_REQUEST_METRIC_URLS:
-                extra_tags["url"] = cast(str, prepared_request.path_url)
-            self._write_request_duration_log(
-                endpoint=self.path,
-                response=response,
-                context=context,
-                extra_tags=extra_tags,
-            )
-        if response.status_code in [401, 403]:
-            self.logger.info("Failed request for {}".format(prepared_request.url))
-            self.logger.info(
-                f"Reason: {response.status_code} - {str(response.content)}"
-            )
-            raise RuntimeError(
-                "Requested resource was unauthorized, forbidden, or not found."
-            )
-        elif response.status_code >= 400:
-            raise RuntimeError(
-                f"Error making request to API: {prepared_request.url} "
-                f"[{response.status_code} - {str(response.content)}]".replace(
-                    "\\n", "\n"
-                )
-            )
-        self.logger.debug("Response received successfully.")
-        return response
-
-
 
-class TapDgIceRestStream(RESTStream):
+class TapDgIceRestStream(StreamMetricsMixin, RequestEngineMixin, RESTStream):
+    """TapDgIce REST stream class."""
 
+    request_max_tries = 15
+    request_backoff_factor = 3
 
-    @backoff.on_exception(
-        backoff.expo,
-        (requests.exceptions.RequestException),
-        max_tries=15,
-        factor=3,
-    )
-    def _request_with_backoff(
-        self, prepared_request, context: Optional[dict]
-    ) -> requests.Response:
-        response = self.requests_session.send(prepared_request)
-        if self._LOG_REQUEST_METRICS:
-            extra_tags = {}
-            if self._LOG_REQUEST_METRIC_URLS:
-                extra_tags["url"] = cast(str, prepared_request.path_url)
-            self._write_request_duration_log(
-                endpoint=self.path,
-                response=response,
-                context=context,
-                extra_tags=extra_tags,
-            )
-        if response.status_code in [401, 403]:
-            self.logger.info("Failed request for {}".format(prepared_request.url))
-            self.logger.info(
-                f"Reason: {response.status_code} - {str(response.content)}"
-            )
-            raise RuntimeError(
-                "Requested resource was unauthorized, forbidden, or not found."
-            )
-        elif response.status_code >= 400:
-            raise RuntimeError(
-                f"Error making request to API: {prepared_request.url} "
-                f"[{response.status_code} - {str(response.content)}]".replace(
-                    "\\n", "\n"
-                )
-            )
-        logging.debug("Response received successfully.")
-        return response
@@ -7,10 +7,49 @@ from typing import Any, Dict, Optional, Union, List, Iterable
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
 from tap_dg_ice.client import TapDgIceStreamByKey
+from tap_dg_ice.holder_totals import HolderTotalsStore, parse_balance
 
-class DGTokenHoldersEth(TapDgIceStreamByKey):
+
+class DGTokenHolders(TapDgIceStreamByKey):
+    """Balance rows of one chain's DG token subgraph.
+
+    While `dg_token_holders_totals` is selected, every row read is also fed to
+    its store, so the totals never re-read a subgraph a holder stream syncs.
+    """
+
+    chain = ""
+    totals_stream: Optional["DGTokenHolderTotals"] = None
+
+    @property
+    def feeds_totals(self) -> bool:
+        """Return True if rows read are fed to a selected totals stream."""
+        return self.totals_stream is not None and self.totals_stream.selected
+
+    @property
+    def query_required_properties(self) -> List[str]:
+        """Always fetch the pagination key, and the totals' inputs if fed."""
+        if self.feeds_totals:
+            return [self.incremental_key, "account", "balance"]
+        return [self.incremental_key]
+
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        if not self.feeds_totals:
+            yield from super().get_records(context)
+            return
+
+        totals_stream = self.totals_stream
+        for record in super().get_records(context):
+            totals_stream.apply_row(self.chain, record)
+            yield record
+        if not self.poll_skipped:
+            indexed_blocks = self.stream_state.get("indexed_blocks", {})
+            totals_stream.source_read(self.chain, indexed_blocks.get(self.url_base))
+
+
+class DGTokenHoldersEth(DGTokenHolders):
     """Define custom stream."""
     name = "dg_token_holders_ethereum"
+    chain = "ethereum"
 
 
     @property
@@ -22,26 +61,11 @@ class DGTokenHoldersEth(TapDgIceStreamByKey):
     incremental_key = 'id'
     initial_key = '0x'
     object_returned = 'balances'
-    query = """
-    query ($key: String!)
-        {
-            balances(
-                first: 1000,
-                    orderBy: id,
-                    orderDirection: asc,
-                    where:{
-                        id_gt: $key
-            }) {
-            id
-            account {
-                id
-            }
-            token {
-                id
-            }
-            balance
-        }
-        }
+    query_arguments = """
+        first: 1000,
+        orderBy: id,
+        orderDirection: asc,
+        where: { id_gt: $key }
     """
 
     schema = th.PropertiesList(
@@ -56,9 +80,10 @@ class DGTokenHoldersEth(TapDgIceStreamByKey):
     ).to_dict()
 
 
-class DGTokenHoldersPolygon(TapDgIceStreamByKey):
+class DGTokenHoldersPolygon(DGTokenHolders):
     """Define custom stream."""
     name = "dg_token_holders_polygon"
+    chain = "polygon"
 
 
     @property
@@ -70,26 +95,11 @@ class DGTokenHoldersPolygon(TapDgIceStreamByKey):
     incremental_key = 'id'
     initial_key = '0x'
     object_returned = 'balances'
-    query = """
-    query ($key: String!)
-        {
-            balances(
-                first: 1000,
-                    orderBy: id,
-                    orderDirection: asc,
-                    where:{
-                        id_gt: $key
-            }) {
-            id
-            account {
-                id
-            }
-            token {
-                id
-            }
-            balance
-        }
-        }
+    query_arguments = """
+        first: 1000,
+        orderBy: id,
+        orderDirection: asc,
+        where: { id_gt: $key }
     """
 
     schema = th.PropertiesList(
@@ -103,3 +113,156 @@ class DGTokenHoldersPolygon(TapDgIceStreamByKey):
         th.Property("balance", th.StringType)
     ).to_dict()
 
+
+
+class DGTokenHolderTotals(TapDgIceStreamByKey):
+    """Per-account DG token totals across Ethereum and Polygon.
+
+    Balance rows are fed to a persistent `HolderTotalsStore`; only accounts
+    whose combined total changed since the previous sync are emitted. Rows of
+    a chain whose holder stream is selected come from that stream as it
+    syncs; the other chains are read here. The SDK syncs streams in name
+    order, so the name sorts after `dg_token_holders_ethereum` and
+    `dg_token_holders_polygon` and their rows are applied in the same run.
+
+    The subgraphs' balance entities carry no update block or timestamp, so
+    changed rows cannot be queried for: every read of a chain fetches all of
+    its balance rows, and that work grows with the table rather than with the
+    number of changes. Only the emitted totals scale with the changes, and a
+    chain whose subgraph has not advanced is not read at all.
+
+    The store's version is kept in the stream state. When it does not match
+    the store file (no bookmark, a lost or stale file, or a sync interrupted
+    before its final state), the store is rebuilt by reading every chain in
+    full, bypassing the unchanged-subgraph check, and all totals are emitted.
+    """
+    name = "dg_token_holders_totals"
+
+    chain_url_settings = {
+        "ethereum": "dg_token_eth",
+        "polygon": "dg_token_polygon",
+    }
+    chain = "ethereum"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.sources: Dict[str, DGTokenHolders] = {}
+        self.source_blocks: Dict[str, Optional[int]] = {}
+        self.rebuilding = False
+
+    @property
+    def url_base(self) -> str:
+        """Return the subgraph URL of the chain currently being read."""
+        return self.config[self.chain_url_settings[self.chain]]
+
+    primary_keys = ["id"]
+    incremental_key = 'id'
+    initial_key = '0x'
+    object_returned = 'balances'
+    query_arguments = """
+        first: 1000,
+        orderBy: id,
+        orderDirection: asc,
+        where: { id_gt: $key }
+    """
+
+    def selection_set(
+        self, properties: dict, breadcrumb: tuple = (), select_all: bool = False
+    ) -> str:
+        """Always fetch the balance row fields, whatever the output schema selects."""
+        return "id account { id } balance"
+
+    def add_source(self, stream: DGTokenHolders) -> None:
+        """Take the rows of `stream`'s chain from it while it is selected."""
+        self.sources[stream.chain] = stream
+        stream.totals_stream = self
+
+    @property
+    def store(self) -> HolderTotalsStore:
+        """Return the holder totals store, persisted to `holder_totals_store`."""
+        if getattr(self, "_store", None) is None:
+            store = HolderTotalsStore(
+                list(self.chain_url_settings), self.config.get("holder_totals_store")
+            )
+            if store.version is None or (
+                store.version != self.stream_state.get("store_version")
+            ):
+                self.logger.info(
+                    f"(stream: {self.name}) Store does not match the state, "
+                    "rebuilding it from every chain."
+                )
+                store.reset()
+                self.stream_state.pop("indexed_blocks", None)
+                self.rebuilding = True
+            self._store = store
+        return self._store
+
+    def apply_row(self, chain: str, row: dict) -> None:
+        """Apply one balance row of `chain` to the store."""
+        self.store.apply(
+            chain, row["id"], row["account"]["id"], parse_balance(row["balance"])
+        )
+
+    def source_read(self, chain: str, block: Optional[int]) -> None:
+        """Note that a holder stream fed a full read of `chain` at `block`."""
+        self.source_blocks[chain] = block
+
+    def needs_read(self, chain: str) -> bool:
+        """Return True if this stream must read `chain` itself.
+
+        Chains with a selected holder stream are read here only while
+        rebuilding, or if the holder's bookmark moved past what the store has
+        applied (e.g. after a sync interrupted before the store was saved).
+        """
+        source = self.sources.get(chain)
+        if source is None or not source.selected:
+            return True
+        if self.rebuilding:
+            return True
+        url = self.url_base
+        source_block = source.stream_state.get("indexed_blocks", {}).get(url)
+        return source_block != self.stream_state.get("indexed_blocks", {}).get(url)
+
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        store = self.store
+        state = self.stream_state
+        indexed_blocks = state.setdefault("indexed_blocks", {})
+        try:
+            for chain in self.chain_url_settings:
+                self.chain = chain
+                if chain in self.source_blocks:
+                    block = self.source_blocks.pop(chain)
+                    if block is not None:
+                        indexed_blocks[self.url_base] = block
+                    continue
+                if not self.needs_read(chain):
+                    continue
+                source = self.sources.get(chain)
+                if source is not None and source.selected:
+                    # Bypass the unchanged-subgraph check for a forced read.
+                    indexed_blocks.pop(self.url_base, None)
+                for row in self.request_records(context):
+                    self.apply_row(chain, row)
+        finally:
+            self.close_cassette()
+
+        # Save before emitting but record the version in the state only once
+        # every total is out, so an interrupted sync rebuilds next time.
+        if store.moved or store.version != state.get("store_version"):
+            store.save()
+        for moved in store.drain_moved():
+            yield {
+                "id": moved["account"],
+                "balance": str(moved["total"]),
+                "balanceEthereum": str(moved["chains"]["ethereum"]),
+                "balancePolygon": str(moved["chains"]["polygon"]),
+            }
+        state["store_version"] = store.version
+        self.rebuilding = False
+
+    schema = th.PropertiesList(
+        th.Property("id", th.StringType),
+        th.Property("balance", th.StringType),
+        th.Property("balanceEthereum", th.StringType),
+        th.Property("balancePolygon", th.StringType),
+    ).to_dict()
@@ -0,0 +1,118 @@
+"""Continuous sync (the `follow` setting) for tap-dg-ice."""
+
+import sys
+import time
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Set
+
+from singer_sdk import Stream
+
+from tap_dg_ice.client import indexing_status
+
+DEFAULT_FOLLOW_INTERVAL = 60
+DEFAULT_FOLLOW_MAX_INTERVAL = 900
+
+
+class FollowScheduler:
+    """Keep a tap alive and re-sync each stream on its own polling interval.
+
+    Stream objects, and with them their HTTP sessions and caches, live for the
+    whole process. A stream that made no progress on a poll has its interval
+    doubled up to `follow_max_interval`; any progress resets it to the base
+    interval. A poll makes progress when it, or one of its child streams,
+    writes a record that the stream's last non-empty poll did not write. Rows
+    read again at an incremental stream's bookmark, or an unchanged table
+    re-emitted by a FULL_TABLE stream, therefore count as idle.
+    """
+
+    def __init__(
+        self,
+        streams: List[Stream],
+        config: Mapping[str, Any],
+        logger: logging.Logger,
+    ):
+        self.streams = streams
+        self.logger = logger
+        self.base_interval = float(
+            config.get("follow_interval") or DEFAULT_FOLLOW_INTERVAL
+        )
+        self.max_interval = float(
+            config.get("follow_max_interval") or DEFAULT_FOLLOW_MAX_INTERVAL
+        )
+        self.stream_intervals: Dict[str, float] = {
+            name: float(seconds)
+            for name, seconds in (config.get("follow_stream_intervals") or {}).items()
+        }
+        self.intervals: Dict[str, float] = {}
+        self.due: Dict[str, float] = {}
+        self.fingerprints: Dict[str, Set[int]] = {}
+
+    def stream_base_interval(self, stream: Stream) -> float:
+        """Return the idle-free polling interval for a stream."""
+        return self.stream_intervals.get(stream.name, self.base_interval)
+
+    def schedule(self, stream: Stream, made_progress: bool) -> None:
+        """Compute when `stream` is next due, backing off while it is idle."""
+        base = self.stream_base_interval(stream)
+        if made_progress or stream.name not in self.intervals:
+            interval = base
+        else:
+            cap = max(self.max_interval, base)
+            interval = min(self.intervals[stream.name] * 2, cap)
+        self.intervals[stream.name] = interval
+        self.due[stream.name] = time.monotonic() + interval
+        self.logger.debug(f"(stream: {stream.name}) Next poll in {interval:.0f}s")
+
+    @classmethod
+    def family(cls, stream: Stream) -> List[Stream]:
+        """Return `stream` and all of its descendant streams."""
+        streams = [stream]
+        for child in getattr(stream, "child_streams", []):
+            streams.extend(cls.family(child))
+        return streams
+
+    def poll(self, stream: Stream) -> bool:
+        """Sync one stream once and report whether it wrote new records."""
+        indexing_status.clear()
+        family = self.family(stream)
+        for member in family:
+            setattr(member, "written_fingerprints", set())
+        try:
+            stream.sync()
+            stream.finalize_state_progress_markers()
+        except Exception as err:
+            self.logger.exception(f"(stream: {stream.name}) Poll failed: {err}")
+            return False
+        finally:
+            sys.stdout.flush()
+
+        made_progress = False
+        for member in family:
+            written = getattr(member, "written_fingerprints", None)
+            setattr(member, "written_fingerprints", None)
+            if not written:
+                # Skipped or empty polls keep the last rows to compare against.
+                continue
+            if written - self.fingerprints.get(member.name, set()):
+                made_progress = True
+            self.fingerprints[member.name] = written
+        return made_progress
+
+    def run(self, max_polls: Optional[int] = None) -> None:
+        """Poll streams forever (or for `max_polls` polls) until interrupted."""
+        for stream in self.streams:
+            self.schedule(stream, made_progress=True)
+
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                now = time.monotonic()
+                next_stream = min(self.streams, key=lambda s: self.due[s.name])
+                wait = self.due[next_stream.name] - now
+                if wait > 0:
+                    time.sleep(wait)
+                made_progress = self.poll(next_stream)
+                self.schedule(next_stream, made_progress)
+                polls += 1
+        except KeyboardInterrupt:
+            self.logger.info("Follow mode interrupted, exiting.")
@@ -3,47 +3,112 @@
 from web3 import Web3
 from web3.exceptions import TransactionNotFound
 import backoff
+from functools import lru_cache
+from decimal import Decimal, localcontext
 from hexbytes import HexBytes
 
+from tap_dg_ice.rpc_pool import RpcPool
+from tap_dg_ice.token_metadata import (
+    DEFAULT_DECIMALS,
+    TokenMetadataResolver,
+    format_amount,
+    scale_amount,
+)
+
 MATIC_URL = 'https://polygon-rpc.com/'
-w3 = Web3(Web3.HTTPProvider(MATIC_URL))
+default_rpc_pool = RpcPool([MATIC_URL])
+default_token_metadata = TokenMetadataResolver(default_rpc_pool)
 DG_WALLET = HexBytes('0x0000000000000000000000007a61a0ed364e599ae4748d1ebe74bf236dd27b09')
-ETH_MULTIPLIER = 1e18
-emptyData = {'paymentTokenAmount': 0, 'paymentTokenAddress': None}
+emptyData = {'paymentTokenAmount': '0', 'paymentTokenAddress': None, 'paymentTokenSymbol': None}
 
 class GetRevenueException(Exception):
      pass
 
+@lru_cache(maxsize=4096)
 @backoff.on_exception(backoff.expo,
                       (TransactionNotFound),
                       max_tries=10)
-def getReceipts(transaction_id):
-    receipts = w3.eth.get_transaction_receipt(transaction_id)
+def getReceipts(transaction_id, rpc_pool=default_rpc_pool):
+    receipts = rpc_pool.call('eth_getTransactionReceipt', [transaction_id])
+    if receipts is None:
+        raise TransactionNotFound(f"Transaction {transaction_id} not found")
     return receipts
 
-def getSecondaryRevenue(transaction_id):
-    receipts = getReceipts(transaction_id)
+def toInt(value):
+    if isinstance(value, str):
+        return int(value, base=16)
+    return value
+
+def getPaymentLogs(receipts):
+    """Return the Transfer logs of a receipt that pay the DG wallet."""
     if 'status' not in receipts:
-        return emptyData
-    
-    logs = receipts['logs']
-    secondaryRevenue = 0
-
-    dgTransactions = []
-    for l in logs:
-        if 'topics' in l and len(l['topics']) >=3 and l['topics'][2] == DG_WALLET:
-            dgTransactions.append(l)
-    if len(dgTransactions) == 0:
+        return []
+
+    paymentLogs = []
+    for l in receipts['logs']:
+        if 'topics' in l and len(l['topics']) >=3 and HexBytes(l['topics'][2]) == DG_WALLET:
+            paymentLogs.append({
+                'logIndex': toInt(l.get('logIndex')),
+                'paymentTokenAddress': Web3.toChecksumAddress(l['address']) if l.get('address') else None,
+                'amount': int(l['data'], base=16),
+            })
+    return paymentLogs
+
+def scalePaymentLogs(paymentLogs, tokenMetadata=None):
+    """Attach each log's token decimals and symbol and its exactly scaled amount.
+
+    `tokenMetadata` maps token addresses to `{"decimals", "symbol"}`; tokens
+    missing from it are assumed to have 18 decimals.
+    """
+    tokenMetadata = tokenMetadata or {}
+    for paymentLog in paymentLogs:
+        metadata = tokenMetadata.get(paymentLog['paymentTokenAddress']) or {}
+        paymentLog['decimals'] = metadata.get('decimals', DEFAULT_DECIMALS)
+        paymentLog['symbol'] = metadata.get('symbol')
+        paymentLog['scaledAmount'] = scale_amount(paymentLog['amount'], paymentLog['decimals'])
+    return paymentLogs
+
+def summarizePaymentLogs(paymentLogs):
+    """Sum the payment of one transaction in the token of its last payment log.
+
+    Amounts in different tokens cannot be added up, so logs paid in any other
+    token are left out of the total; they are still emitted one per row by
+    the payment logs stream.
+    """
+    if len(paymentLogs) == 0:
         return emptyData
 
-    paymentTokenAddress = None
-    for secondaryRev in dgTransactions:
-        if 'address' in secondaryRev and secondaryRev['address']:
-            paymentTokenAddress = secondaryRev['address']
-        additionalRevenue = int(secondaryRev['data'], base=16)
-        secondaryRevenue += additionalRevenue
+    paymentTokenAddress = paymentLogs[-1]['paymentTokenAddress']
+    paymentTokenSymbol = paymentLogs[-1]['symbol']
+    with localcontext() as context:
+        context.prec = 100
+        secondaryRevenue = Decimal(0)
+        for paymentLog in paymentLogs:
+            if paymentLog['paymentTokenAddress'] == paymentTokenAddress:
+                secondaryRevenue += paymentLog['scaledAmount']
 
-    secondaryRevenue = secondaryRevenue / ETH_MULTIPLIER
+    return {
+        'paymentTokenAmount': format_amount(secondaryRevenue),
+        'paymentTokenAddress': paymentTokenAddress,
+        'paymentTokenSymbol': paymentTokenSymbol,
+    }
 
-    return {'paymentTokenAmount': secondaryRevenue, 'paymentTokenAddress': paymentTokenAddress}
+def getSecondaryRevenue(transaction_id, receipts=None, rpc_pool=default_rpc_pool,
+                        tokenMetadata=None):
+    """Return the payment summary of a transaction, scaled by each token's decimals.
 
+    `tokenMetadata` is the `TokenMetadataResolver` to use; by default one
+    sharing `rpc_pool` is used.
+    """
+    if receipts is None:
+        receipts = getReceipts(transaction_id, rpc_pool)
+    if tokenMetadata is None:
+        if rpc_pool is default_rpc_pool:
+            tokenMetadata = default_token_metadata
+        else:
+            tokenMetadata = TokenMetadataResolver(rpc_pool)
+    paymentLogs = getPaymentLogs(receipts)
+    tokens = {paymentLog['paymentTokenAddress'] for paymentLog in paymentLogs}
+    tokens.discard(None)
+    scalePaymentLogs(paymentLogs, tokenMetadata.resolve(sorted(tokens)))
+    return summarizePaymentLogs(paymentLogs)
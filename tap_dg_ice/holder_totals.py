@@ -0,0 +1,132 @@
+"""Compact store of per-account DG token totals across chains."""
+
+import json
+import uuid
+from array import array
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Union
+
+Balance = Union[int, Decimal]
+
+
+def parse_balance(value: str) -> Balance:
+    """Parse a subgraph balance string exactly (BigInt, or BigDecimal if fractional)."""
+    try:
+        return int(value)
+    except ValueError:
+        return Decimal(value)
+
+
+class HolderTotalsStore:
+    """Per-account balance totals, updated only from changed balance rows.
+
+    Accounts are interned to a dense index; each chain keeps a list of
+    big-integer totals addressed by that index. Every balance row (keyed by
+    chain and row id) remembers its account index and last seen balance, so
+    applying a row costs O(1) and only rows whose balance changed touch the
+    totals. Accounts whose totals moved are collected until `drain_moved`.
+    Every `save` gives the store a new random `version`, which callers keep
+    next to their bookmarks to tell whether the file matches their state.
+    """
+
+    def __init__(self, chains: Sequence[str], path: Optional[Path] = None) -> None:
+        self.chains = list(chains)
+        self.path = Path(path) if path else None
+        self.version: Optional[str] = None
+        self.reset()
+        if self.path and self.path.exists():
+            self._load()
+
+    def reset(self) -> None:
+        """Forget every account and row, keeping `path` and `version`."""
+        self.accounts: List[str] = []
+        self.account_index: Dict[str, int] = {}
+        self.totals: Dict[str, List[Balance]] = {chain: [] for chain in self.chains}
+        self.row_index: Dict[str, int] = {}
+        self.row_accounts = array("L")
+        self.row_balances: List[Balance] = []
+        self.moved: Set[int] = set()
+
+    def intern(self, account: str) -> int:
+        """Return the dense index of `account`, allocating one if new."""
+        index = self.account_index.get(account)
+        if index is None:
+            index = len(self.accounts)
+            self.account_index[account] = index
+            self.accounts.append(account)
+            for totals in self.totals.values():
+                totals.append(0)
+        return index
+
+    def apply(self, chain: str, row_id: str, account: str, balance: Balance) -> bool:
+        """Apply one balance row; return True if it changed the account's total."""
+        key = f"{chain}:{row_id}"
+        row = self.row_index.get(key)
+        if row is None:
+            account_index = self.intern(account)
+            self.row_index[key] = len(self.row_balances)
+            self.row_accounts.append(account_index)
+            self.row_balances.append(0)
+            row = self.row_index[key]
+        else:
+            account_index = self.row_accounts[row]
+
+        delta = balance - self.row_balances[row]
+        if not delta:
+            return False
+        self.row_balances[row] = balance
+        self.totals[chain][account_index] += delta
+        self.moved.add(account_index)
+        return True
+
+    def drain_moved(self) -> Iterator[dict]:
+        """Yield and forget the accounts whose totals moved since the last drain."""
+        for account_index in sorted(self.moved):
+            per_chain = {
+                chain: self.totals[chain][account_index] for chain in self.chains
+            }
+            yield {
+                "account": self.accounts[account_index],
+                "total": sum(per_chain.values()),
+                "chains": per_chain,
+            }
+        self.moved.clear()
+
+    def save(self) -> None:
+        """Give the store a new `version` and persist it to `path`, if set."""
+        self.version = uuid.uuid4().hex
+        if not self.path:
+            return
+        rows = sorted(self.row_index.items(), key=lambda item: item[1])
+        data = {
+            "version": self.version,
+            "accounts": self.accounts,
+            "totals": {
+                chain: [str(v) for v in totals] for chain, totals in self.totals.items()
+            },
+            "rows": [key for key, _ in rows],
+            "row_accounts": self.row_accounts.tolist(),
+            "row_balances": [str(v) for v in self.row_balances],
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.path.with_suffix(".tmp")
+        with open(temporary_path, "w") as store_file:
+            json.dump(data, store_file, separators=(",", ":"))
+        temporary_path.replace(self.path)
+
+    def _load(self) -> None:
+        with open(self.path) as store_file:
+            data = json.load(store_file)
+        self.version = data.get("version")
+        self.accounts = data["accounts"]
+        self.account_index = {account: i for i, account in enumerate(self.accounts)}
+        for chain in self.chains:
+            stored = data["totals"].get(chain)
+            if stored:
+                self.totals[chain] = [parse_balance(v) for v in stored]
+            else:
+                self.totals[chain] = [0] * len(self.accounts)
+        self.row_index = {key: i for i, key in enumerate(data["rows"])}
+        self.row_accounts = array("L", data["row_accounts"])
+        self.row_balances = [parse_balance(v) for v in data["row_balances"]]
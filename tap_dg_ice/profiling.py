@@ -0,0 +1,152 @@
+"""Timing spans and a sampling profiler for the tap's sync hot path."""
+
+import sys
+import json
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+
+STAGES = ("fetch", "parse", "enrich", "post_process", "emit")
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+T = TypeVar("T")
+
+
+class SpanRecorder:
+    """Accumulate call counts and wall time per (stream, stage).
+
+    Disabled by default, in which case `span` only checks a flag.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.totals: Dict[str, Dict[str, List[float]]] = defaultdict(
+            lambda: defaultdict(lambda: [0, 0.0])
+        )
+
+    @contextmanager
+    def span(self, stream_name: str, stage: str) -> Iterator[None]:
+        """Time the enclosed block as `stage` of `stream_name`."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = self.totals[stream_name][stage]
+            total[0] += 1
+            total[1] += time.perf_counter() - started
+
+    def iterate(
+        self, stream_name: str, stage: str, iterable: Iterable[T]
+    ) -> Iterable[T]:
+        """Time each step of a lazy `iterable` as `stage`, excluding its consumer."""
+        if not self.enabled:
+            return iterable
+        return self._timed(stream_name, stage, iter(iterable))
+
+    def _timed(
+        self, stream_name: str, stage: str, iterator: Iterator[T]
+    ) -> Iterator[T]:
+        while True:
+            with self.span(stream_name, stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def report(self) -> Dict[str, Dict[str, dict]]:
+        """Return `{stream: {stage: {"calls", "seconds"}}}`."""
+        return {
+            stream: {
+                stage: {"calls": int(calls), "seconds": round(seconds, 6)}
+                for stage, (calls, seconds) in stages.items()
+            }
+            for stream, stages in self.totals.items()
+        }
+
+    def format_report(self) -> str:
+        """Return a per-stream, per-stage breakdown as a text table."""
+        lines = [f"{'stream':<36}" + "".join(f"{stage:>14}" for stage in STAGES)]
+        for stream, stages in sorted(self.totals.items()):
+            cells = "".join(
+                f"{stages[stage][1]:>13.3f}s" if stage in stages else f"{'-':>14}"
+                for stage in STAGES
+            )
+            lines.append(f"{stream:<36}{cells}")
+        return "\n".join(lines)
+
+
+class SamplingProfiler(threading.Thread):
+    """Periodically sample a thread's stack into collapsed-stack counts.
+
+    The output of `write_folded` is the "folded" format read by flamegraph.pl,
+    speedscope and inferno: one `frame;frame;frame count` line per stack.
+    """
+
+    def __init__(
+        self, target_thread_id: int, interval: float = DEFAULT_SAMPLE_INTERVAL
+    ) -> None:
+        super().__init__(name="tap-dg-ice-profiler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the thread to exit."""
+        self._stopped.set()
+        self.join()
+
+    def write_folded(self, path: Path) -> None:
+        """Write the collected samples in collapsed-stack format."""
+        with open(path, "w") as folded_file:
+            for stack, count in self.samples.most_common():
+                folded_file.write(f"{stack} {count}\n")
+
+
+profiler = SpanRecorder()
+
+
+@contextmanager
+def profile_sync(
+    output_dir: Path, logger: logging.Logger, interval: Optional[float] = None
+) -> Iterator[None]:
+    """Enable spans and stack sampling for the enclosed sync, then write reports.
+
+    Writes `spans.json` (per-stream stage timings) and `profile.folded`
+    (flamegraph input) to `output_dir` and logs the stage breakdown.
+    """
+    sampler = SamplingProfiler(
+        threading.get_ident(), interval or DEFAULT_SAMPLE_INTERVAL
+    )
+    profiler.enabled = True
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        profiler.enabled = False
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with open(output_dir / "spans.json", "w") as spans_file:
+            json.dump(profiler.report(), spans_file, indent=2)
+        sampler.write_folded(output_dir / "profile.folded")
+        logger.info("Sync profile (seconds per stage):\n" + profiler.format_report())
+        logger.info(f"Profile written to {output_dir}")
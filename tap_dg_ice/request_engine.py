@@ -0,0 +1,153 @@
+"""Shared HTTP request engine with retry classification, backoff and hooks."""
+
+import time
+import logging
+import threading
+from typing import Callable, Optional, Tuple, Union
+
+import backoff
+import requests
+
+from tap_dg_ice.cassette import Cassette
+
+# Status codes worth retrying: rate limiting and transient server-side failures.
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504, 520, 522, 524})
+# Status codes that will not succeed on retry and should stop the sync.
+AUTH_STATUSES = frozenset({401, 403})
+
+ResponseHook = Callable[[requests.PreparedRequest, requests.Response, float], None]
+
+
+class RetryableResponseError(RuntimeError):
+    """Raised for responses whose status code is worth retrying."""
+
+    def __init__(self, message: str, response: requests.Response) -> None:
+        super().__init__(message)
+        self.response = response
+
+
+class RateLimiter:
+    """Thread-safe limiter allowing at most `requests_per_second` request starts."""
+
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until the next request may start."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RequestEngine:
+    """Send prepared requests with per-status retry classification.
+
+    Connection errors, timeouts and `RETRY_STATUSES` responses are retried with
+    full-jitter exponential backoff, bounded by both `max_tries` and a total
+    `max_time` budget in seconds. Other 4xx/5xx responses fail immediately.
+    `on_response` is called after every attempt (useful for metrics) and an
+    optional `rate_limiter` is acquired before every attempt. With a
+    `cassette`, round trips are recorded to or replayed from disk; replayed
+    retries are not delayed, so replays stay fast and deterministic.
+    """
+
+    def __init__(
+        self,
+        max_tries: int = 7,
+        factor: float = 2,
+        max_time: Optional[float] = None,
+        timeout: Union[float, Tuple[float, float], None] = (10, 300),
+        retry_statuses: frozenset = RETRY_STATUSES,
+        rate_limiter: Optional[RateLimiter] = None,
+        on_response: Optional[ResponseHook] = None,
+        logger: Optional[logging.Logger] = None,
+        cassette: Optional[Cassette] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.cassette = cassette
+        self.retry_statuses = retry_statuses
+        self.rate_limiter = rate_limiter
+        self.on_response = on_response
+        self.logger = logger or logging.getLogger(__name__)
+        if cassette and cassette.replaying:
+            wait = dict(wait_gen=backoff.constant, interval=0, jitter=None)
+        else:
+            wait = dict(
+                wait_gen=backoff.expo, factor=factor, jitter=backoff.full_jitter
+            )
+        self._send_with_backoff = backoff.on_exception(
+            exception=(requests.exceptions.RequestException, RetryableResponseError),
+            max_tries=max_tries,
+            max_time=max_time,
+            on_backoff=self._log_backoff,
+            **wait,
+        )(self._send_once)
+
+    def send(
+        self,
+        session: requests.Session,
+        prepared_request: requests.PreparedRequest,
+        on_response: Optional[ResponseHook] = None,
+    ) -> requests.Response:
+        """Send `prepared_request`, retrying transient failures."""
+        return self._send_with_backoff(session, prepared_request, on_response)
+
+    def transmit(
+        self, session: requests.Session, prepared_request: requests.PreparedRequest
+    ) -> requests.Response:
+        """Perform a single HTTP round trip, through the cassette if there is one."""
+        if self.cassette:
+            return self.cassette.transmit(
+                session, prepared_request, timeout=self.timeout
+            )
+        return session.send(prepared_request, timeout=self.timeout)
+
+    def _send_once(
+        self,
+        session: requests.Session,
+        prepared_request: requests.PreparedRequest,
+        on_response: Optional[ResponseHook],
+    ) -> requests.Response:
+        if self.rate_limiter and not (self.cassette and self.cassette.replaying):
+            self.rate_limiter.acquire()
+        started = time.perf_counter()
+        response = self.transmit(session, prepared_request)
+        elapsed = time.perf_counter() - started
+        for hook in (self.on_response, on_response):
+            if hook:
+                hook(prepared_request, response, elapsed)
+        self.validate_response(prepared_request, response)
+        self.logger.debug("Response received successfully.")
+        return response
+
+    def validate_response(
+        self, prepared_request: requests.PreparedRequest, response: requests.Response
+    ) -> None:
+        """Raise for error responses, marking the transient ones as retryable."""
+        status = response.status_code
+        if status in AUTH_STATUSES:
+            self.logger.info("Failed request for {}".format(prepared_request.url))
+            self.logger.info(f"Reason: {status} - {str(response.content)}")
+            raise RuntimeError(
+                "Requested resource was unauthorized, forbidden, or not found."
+            )
+        if status < 400:
+            return
+        message = (
+            f"Error making request to API: {prepared_request.url} "
+            f"[{status} - {str(response.content)}]".replace("\\n", "\n")
+        )
+        if status in self.retry_statuses:
+            raise RetryableResponseError(message, response)
+        raise RuntimeError(message)
+
+    def _log_backoff(self, details: dict) -> None:
+        self.logger.warning(
+            f"Backing off {details['wait']:.1f}s after try {details['tries']} "
+            f"({details['elapsed']:.1f}s elapsed)"
+        )
@@ -0,0 +1,232 @@
+"""JSON-RPC client spreading calls over several endpoints with hedging."""
+
+import time
+import logging
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_HEDGE_AFTER = 1.0
+MIN_HEDGE_AFTER = 0.05
+LATENCY_WINDOW = 100
+MIN_LATENCY_SAMPLES = 10
+FAILURE_COOLDOWN = 30
+FAILURES_BEFORE_COOLDOWN = 3
+
+
+class RpcError(RuntimeError):
+    """Raised when a JSON-RPC call fails on every endpoint."""
+
+
+def is_revert(error: Any) -> bool:
+    """Return True if a JSON-RPC error reports a reverted contract call.
+
+    A revert is the contract's own answer and is the same on every node, so
+    unlike other errors it says nothing about the endpoint's health.
+    """
+    if not isinstance(error, dict):
+        return False
+    return error.get("code") == 3 or "revert" in str(error.get("message", "")).lower()
+
+
+class RpcEndpoint:
+    """One JSON-RPC URL together with its recent latency and health."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.session = requests.Session()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.successes = 0
+        self.cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float) -> None:
+        """Record a successful call and its latency."""
+        with self._lock:
+            self.latencies.append(latency)
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+
+    def record_failure(self) -> None:
+        """Record a failed call; repeated failures cool the endpoint down."""
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURES_BEFORE_COOLDOWN:
+                self.cooldown_until = time.monotonic() + FAILURE_COOLDOWN
+
+    @property
+    def healthy(self) -> bool:
+        """Return False while the endpoint is cooling down after failures."""
+        return time.monotonic() >= self.cooldown_until
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Return a latency percentile, or None without enough samples."""
+        with self._lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    @property
+    def score(self) -> float:
+        """Return the expected cost of a call; lower is better.
+
+        Median latency inflated by the endpoint's failure rate. Endpoints
+        without enough samples score 0 so that they get measured.
+        """
+        median = self.percentile(0.5)
+        if median is None:
+            return 0.0
+        total = self.failures + self.successes
+        return median * (1 + 4 * self.failures / total)
+
+
+class RpcPool:
+    """Send JSON-RPC calls to the best of several endpoints.
+
+    Endpoints are ranked by `RpcEndpoint.score`, skipping those cooling down
+    after repeated failures. If the chosen endpoint has not answered within
+    its own p95 latency (or `hedge_after` seconds, if set), the same call is
+    fired at the next-best endpoint and the first successful answer wins.
+    Failed calls fail over to the remaining endpoints in rank order; a 200
+    response carrying a JSON-RPC `error` (other than a revert) or a malformed
+    batch counts as a failure of the endpoint that sent it.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        timeout: float = DEFAULT_TIMEOUT,
+        hedge_after: Optional[float] = None,
+        max_workers: int = 8,
+    ) -> None:
+        if not urls:
+            raise ValueError("RpcPool needs at least one endpoint URL.")
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.logger = logging.getLogger(__name__)
+        self._ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rpc-pool"
+        )
+
+    def ranked_endpoints(self) -> List[RpcEndpoint]:
+        """Return endpoints best-first, unhealthy ones last."""
+        return sorted(self.endpoints, key=lambda e: (not e.healthy, e.score))
+
+    def hedge_delay(self, endpoint: RpcEndpoint) -> float:
+        """Return how long to wait on `endpoint` before hedging."""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        p95 = endpoint.percentile(0.95)
+        if p95 is None:
+            return DEFAULT_HEDGE_AFTER
+        return max(MIN_HEDGE_AFTER, p95)
+
+    def call(self, method: str, params: list) -> Any:
+        """Return the `result` of a single JSON-RPC call."""
+        response = self._send(self._request(method, params))
+        if "error" in response:
+            raise RpcError(f"{method} failed: {response['error']}")
+        return response.get("result")
+
+    def batch(self, calls: Sequence[Tuple[str, list]]) -> List[Any]:
+        """Send several calls in one JSON-RPC batch and return results in order.
+
+        Reverted calls yield None; any other error fails the whole batch over
+        to the next endpoint.
+        """
+        if not calls:
+            return []
+        payload = [self._request(method, params) for method, params in calls]
+        responses = {response["id"]: response for response in self._send(payload)}
+        return [responses[request["id"]].get("result") for request in payload]
+
+    def _request(self, method: str, params: list) -> dict:
+        return {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": params,
+        }
+
+    @staticmethod
+    def _check_body(payload: Any, body: Any) -> None:
+        """Raise `RpcError` unless `body` is a usable answer to `payload`."""
+        if isinstance(payload, list):
+            if not isinstance(body, list):
+                raise RpcError(f"Expected a batch response, got {body!r:.200}")
+            missing = {request["id"] for request in payload} - {
+                response.get("id") for response in body if isinstance(response, dict)
+            }
+            if missing:
+                raise RpcError(f"Batch response is missing ids {sorted(missing)}")
+            responses = body
+        elif isinstance(body, dict):
+            responses = [body]
+        else:
+            raise RpcError(f"Expected a JSON-RPC response, got {body!r:.200}")
+        for response in responses:
+            error = response.get("error")
+            if error is not None and not is_revert(error):
+                raise RpcError(f"JSON-RPC error: {error}")
+
+    def _post(self, endpoint: RpcEndpoint, payload: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            response = endpoint.session.post(
+                endpoint.url, json=payload, timeout=self.timeout
+            )
+            response.raise_for_status()
+            body = response.json()
+            self._check_body(payload, body)
+        except Exception:
+            endpoint.record_failure()
+            raise
+        endpoint.record_success(time.perf_counter() - started)
+        return body
+
+    def _send(self, payload: Any) -> Any:
+        candidates = deque(self.ranked_endpoints())
+        pending: Dict[Future, RpcEndpoint] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            endpoint = candidates.popleft()
+            pending[self._executor.submit(self._post, endpoint, payload)] = endpoint
+
+        launch()
+        while pending:
+            primary = next(iter(pending.values()))
+            can_hedge = bool(candidates) and len(pending) < 2
+            done, _ = wait(
+                pending,
+                timeout=self.hedge_delay(primary) if can_hedge else None,
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                self.logger.debug(
+                    f"Hedging RPC call after slow response from {primary.url}"
+                )
+                launch()
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                last_error = error
+                self.logger.warning(f"RPC call to {endpoint.url} failed: {error}")
+            if not pending and candidates:
+                launch()
+        raise RpcError(f"RPC call failed on every endpoint: {last_error}")
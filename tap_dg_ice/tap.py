@@ -1,10 +1,20 @@
 """TapDgIce tap class."""
 
-from typing import List
+from pathlib import Path
+from typing import List, Optional
 
+import click
 from singer_sdk import Tap, Stream
 from singer_sdk import typing as th  # JSON schema typing helpers
 
+from tap_dg_ice.client import indexing_status
+from tap_dg_ice.follow import (
+    DEFAULT_FOLLOW_INTERVAL,
+    DEFAULT_FOLLOW_MAX_INTERVAL,
+    FollowScheduler,
+)
+from tap_dg_ice.profiling import profile_sync
+
 from tap_dg_ice.timestamped_streams import (
     IceTransferEvents,
     InitialMintingEvent,
@@ -12,11 +22,14 @@ from tap_dg_ice.timestamped_streams import (
     UpgradeResolvedEvents,
     NFTItems,
     SecondaryRevenueICETransfer,
+    SecondaryRevenuePaymentLogs,
 )
 
 from tap_dg_ice.complete_streams import (
+    DGTokenHolders,
     DGTokenHoldersEth,
     DGTokenHoldersPolygon,
+    DGTokenHolderTotals,
 )
 
 
@@ -28,7 +41,9 @@ STREAM_TYPES = [
     NFTItems,
     DGTokenHoldersEth,
     DGTokenHoldersPolygon,
+    DGTokenHolderTotals,
     SecondaryRevenueICETransfer,
+    SecondaryRevenuePaymentLogs,
 ]
 
 
@@ -43,9 +58,95 @@ class TapTapDgIce(Tap):
         th.Property("dg_token_eth", th.StringType, default='https://api.thegraph.com/subgraphs/name/satoshi-naoki/decentral-games-ethereum'),
         th.Property("dg_token_polygon", th.StringType, default='https://api.thegraph.com/subgraphs/name/satoshi-naoki/decentral-games-polygon'),
         th.Property("secondary_revenue_graph_url", th.StringType, default='https://api.thegraph.com/subgraphs/name/tabatha-decentralgames/secondary-revenue-ice'),
+        th.Property("polygon_rpc_urls", th.ArrayType(th.StringType), default=['https://polygon-rpc.com/']),
+        th.Property("rpc_timeout", th.NumberType),
+        th.Property("rpc_hedge_after", th.NumberType),
+        th.Property("holder_totals_store", th.StringType, default='.holder_totals.json'),
+        th.Property("token_metadata_cache", th.StringType, default='.token_metadata.json'),
+        th.Property("request_max_tries", th.IntegerType),
+        th.Property("request_backoff_factor", th.NumberType),
+        th.Property("request_max_time", th.NumberType),
+        th.Property("request_timeout", th.NumberType),
+        th.Property("requests_per_second", th.NumberType),
+        th.Property("cassette_mode", th.StringType),
+        th.Property("cassette_dir", th.StringType, default="cassettes"),
+        th.Property("skip_unchanged_subgraphs", th.BooleanType, default=True),
+        th.Property("subgraph_min_block_advance", th.IntegerType, default=1),
+        th.Property("follow", th.BooleanType, default=False),
+        th.Property("follow_interval", th.IntegerType, default=DEFAULT_FOLLOW_INTERVAL),
+        th.Property("follow_max_interval", th.IntegerType, default=DEFAULT_FOLLOW_MAX_INTERVAL),
+        th.Property("follow_stream_intervals", th.ObjectType()),
+        th.Property("profile", th.BooleanType, default=False),
+        th.Property("profile_dir", th.StringType, default="profile"),
+        th.Property("profile_sample_interval", th.NumberType),
     ).to_dict()
 
+    def run_sync(self) -> None:
+        """Sync all streams, profiling the run if `profile` is set."""
+        if not self.config.get("profile"):
+            self._run_sync()
+            return
+
+        with profile_sync(
+            Path(self.config.get("profile_dir") or "profile"),
+            self.logger,
+            self.config.get("profile_sample_interval"),
+        ):
+            self._run_sync()
+
+    def _run_sync(self) -> None:
+        """Sync all streams once, then keep polling them if `follow` is set."""
+        indexing_status.clear()
+        self.sync_all()
+        if not self.config.get("follow"):
+            return
+
+        streams = [
+            stream
+            for stream in self.streams.values()
+            if (stream.selected or stream.has_selected_descendents)
+            and not stream.parent_stream_type
+        ]
+        FollowScheduler(streams, self.config, self.logger).run()
 
     def discover_streams(self) -> List[Stream]:
         """Return a list of discovered streams."""
-        return [stream_class(tap=self) for stream_class in STREAM_TYPES]
+        streams = [stream_class(tap=self) for stream_class in STREAM_TYPES]
+        for totals_stream in streams:
+            if isinstance(totals_stream, DGTokenHolderTotals):
+                for stream in streams:
+                    if isinstance(stream, DGTokenHolders):
+                        totals_stream.add_source(stream)
+        return streams
+
+
+def cli(args: Optional[List[str]] = None) -> None:
+    """Run the tap's command line.
+
+    `Tap.sync_all` is final, so sync runs go through `TapTapDgIce.run_sync`
+    to add profiling and follow mode; every other mode is the SDK's own.
+    """
+    sdk_command = TapTapDgIce.cli
+
+    def callback(**options) -> None:
+        if any(options[flag] for flag in ("version", "about", "discover", "test")):
+            sdk_command.callback(**options)
+            return
+
+        TapTapDgIce.print_version(print_fn=TapTapDgIce.logger.info)
+        tap = TapTapDgIce(
+            config=[path for path in options["config"] if path != "ENV"] or None,
+            state=options["state"],
+            catalog=options["catalog"],
+            parse_env_config="ENV" in options["config"],
+        )
+        tap.run_sync()
+
+    command = click.Command(
+        TapTapDgIce.name,
+        params=sdk_command.params,
+        callback=callback,
+        help=sdk_command.help,
+        context_settings=sdk_command.context_settings,
+    )
+    command.main(args=args, prog_name=TapTapDgIce.name)
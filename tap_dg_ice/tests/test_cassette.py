@@ -0,0 +1,134 @@
+"""Tests for recording a sync to a cassette and replaying it offline."""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from backoff import _sync
+
+from tap_dg_ice.cassette import RECORD, Cassette
+from tap_dg_ice.tap import TapTapDgIce
+
+TRANSACTION = "0x" + "ab" * 32
+USDC = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
+DG_WALLET_TOPIC = "0x0000000000000000000000007a61a0ed364e599ae4748d1ebe74bf236dd27b09"
+RECEIPT = {
+    "status": "0x1",
+    "logs": [
+        {
+            "address": USDC.lower(),
+            "topics": ["0x" + "00" * 32, "0x" + "00" * 32, DG_WALLET_TOPIC],
+            "data": hex(2_500_000),
+            "logIndex": "0x3",
+        }
+    ],
+}
+ETH_CALL_RESULTS = {
+    "0x313ce567": "0x" + "6".rjust(64, "0"),
+    "0x95d89b41": "0x" + b"USDC".hex().ljust(64, "0"),
+}
+TRANSFER = {
+    "id": TRANSACTION,
+    "timestamp": "1650000000",
+    "tokenId": "1",
+    "value": "10",
+    "blockNumber": "42",
+}
+
+
+def serve(statuses, answer):
+    """Serve JSON `answer(payload)` after returning each scripted status first."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            status = statuses.pop(0) if statuses else 200
+            data = json.dumps(answer(payload)).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+
+def rpc_answer(payload):
+    def result(call):
+        if call["method"] == "eth_getTransactionReceipt":
+            value = RECEIPT
+        else:
+            value = ETH_CALL_RESULTS[call["params"][0]["data"]]
+        return {"jsonrpc": "2.0", "id": call["id"], "result": value}
+
+    if isinstance(payload, list):
+        return [result(call) for call in payload]
+    return result(payload)
+
+
+@pytest.fixture
+def servers():
+    page = {"data": {"transferEvents": [TRANSFER]}}
+    graph, graph_url = serve([503], lambda payload: page)
+    rpc, rpc_url = serve([], rpc_answer)
+    yield graph_url, rpc_url, [graph, rpc]
+    for server in (graph, rpc):
+        server.shutdown()
+
+
+def sync_transfers(tmp_path, mode, graph_url, rpc_url):
+    tap = TapTapDgIce(
+        config={
+            "secondary_revenue_graph_url": graph_url,
+            "polygon_rpc_urls": [rpc_url],
+            "token_metadata_cache": str(tmp_path / f"{mode}-tokens.json"),
+            "cassette_mode": mode,
+            "cassette_dir": str(tmp_path / "cassettes"),
+            "request_backoff_factor": 0.01,
+        },
+        parse_env_config=False,
+    )
+    return list(tap.streams["secondary_revenue_ice_transfer"].get_records(None))
+
+
+def test_record_then_replay_offline(tmp_path, servers, monkeypatch):
+    graph_url, rpc_url, running = servers
+    recorded = sync_transfers(tmp_path, "record", graph_url, rpc_url)
+    assert recorded[0]["paymentTokenAmount"] == "2.5"
+    assert recorded[0]["paymentTokenSymbol"] == "USDC"
+
+    for server in running:
+        server.shutdown()
+    sleeps = []
+    monkeypatch.setattr(_sync.time, "sleep", sleeps.append)
+    replayed = sync_transfers(tmp_path, "replay", graph_url, rpc_url)
+
+    assert replayed == recorded
+    assert sleeps == [0]
+
+
+def test_closed_cassette_is_appended_and_truncation_is_tolerated(tmp_path):
+    path = tmp_path / "stream.jsonl.gz"
+    cassette = Cassette(path, RECORD)
+    cassette.record("receipt", "0x1", {"n": 1})
+    cassette.close()
+    cassette.record("receipt", "0x2", {"n": 2})
+    cassette.close()
+
+    assert Cassette(path, "replay").replay("receipt", "0x2") == {"n": 2}
+
+    with gzip.open(tmp_path / "killed.jsonl.gz", "wt") as killed:
+        killed.write(json.dumps({"key": Cassette.key("receipt", "0x1"), "response": 1}))
+        killed.write("\n" + "x" * 10000)
+    data = (tmp_path / "killed.jsonl.gz").read_bytes()
+    (tmp_path / "killed.jsonl.gz").write_bytes(data[: len(data) - 20])
+
+    truncated = Cassette(tmp_path / "killed.jsonl.gz", "replay")
+    assert truncated.replay("receipt", "0x1") == 1
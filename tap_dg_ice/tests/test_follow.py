@@ -0,0 +1,111 @@
+"""Tests for the follow-mode polling schedule and progress detection."""
+
+import itertools
+import json
+import logging
+
+import pytest
+from singer_sdk.streams import RESTStream
+
+from tap_dg_ice import client
+from tap_dg_ice.follow import FollowScheduler
+from tap_dg_ice.tap import TapTapDgIce, cli
+
+CONFIG = {"follow_interval": 10, "follow_max_interval": 60}
+
+
+class FakeStream:
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def scheduler():
+    return FollowScheduler([], CONFIG, logging.getLogger("test"))
+
+
+def test_schedule_doubles_while_idle_up_to_cap_and_resets_on_progress(scheduler):
+    stream = FakeStream("nft_items")
+    intervals = []
+    for made_progress in (True, False, False, False, False, True):
+        scheduler.schedule(stream, made_progress)
+        intervals.append(scheduler.intervals[stream.name])
+
+    assert intervals == [10, 20, 40, 60, 60, 10]
+
+
+def test_stream_interval_above_cap_is_not_lowered(scheduler):
+    scheduler.stream_intervals["slow"] = 120
+    stream = FakeStream("slow")
+    scheduler.schedule(stream, True)
+    scheduler.schedule(stream, False)
+
+    assert scheduler.intervals["slow"] == 120
+
+
+@pytest.fixture
+def subgraph(monkeypatch):
+    """Fake subgraph that answers `timestamp_gte: <bookmark>` from `rows`.
+
+    Its indexed block advances on every poll, so no poll is skipped.
+    """
+    fake = {"rows": [], "balances": {}}
+    blocks = itertools.count(100)
+
+    def request_records(stream, context):
+        if stream.name == "nft_items":
+            start = stream.get_starting_replication_key_value(context) or 0
+            yield from (dict(r) for r in fake["rows"] if r["createdAt"] >= start)
+        else:
+            for account, balance in fake["balances"].items():
+                row = {"id": f"dg-{account}", "account": {"id": account}}
+                yield {**row, "balance": balance}
+
+    monkeypatch.setattr(RESTStream, "request_records", request_records)
+    monkeypatch.setattr(
+        client.indexing_status,
+        "get",
+        lambda url, engine, session, headers: {"number": next(blocks), "timestamp": 0},
+    )
+    return fake
+
+
+def real_stream(name, tmp_path):
+    config = {"holder_totals_store": str(tmp_path / "totals.json")}
+    return TapTapDgIce(config=config, parse_env_config=False).streams[name]
+
+
+def test_rows_read_again_at_the_bookmark_are_not_progress(
+    scheduler, subgraph, tmp_path, capsys
+):
+    stream = real_stream("nft_items", tmp_path)
+    subgraph["rows"] = [{"id": "item-1", "createdAt": 5}]
+
+    assert [scheduler.poll(stream) for _ in range(3)] == [True, False, False]
+    subgraph["rows"].append({"id": "item-2", "createdAt": 7})
+    assert scheduler.poll(stream) is True
+    assert scheduler.poll(stream) is False
+
+
+def test_unchanged_full_table_is_not_progress(scheduler, subgraph, tmp_path, capsys):
+    stream = real_stream("dg_token_holders_ethereum", tmp_path)
+    subgraph["balances"] = {"alice": "10", "bob": "5"}
+
+    assert [scheduler.poll(stream) for _ in range(3)] == [True, False, False]
+    subgraph["balances"]["alice"] = "20"
+    assert scheduler.poll(stream) is True
+    assert scheduler.poll(stream) is False
+
+
+def test_follow_setting_keeps_polling_after_the_first_sync(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(TapTapDgIce, "sync_all", lambda tap: calls.append("sync"))
+    monkeypatch.setattr(FollowScheduler, "run", lambda self: calls.append("follow"))
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"follow": True}))
+
+    with pytest.raises(SystemExit) as exit:
+        cli(["--config", str(config)])
+
+    assert exit.value.code == 0
+    assert calls == ["sync", "follow"]
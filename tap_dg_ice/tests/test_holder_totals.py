@@ -0,0 +1,183 @@
+"""Tests for the cross-chain holder totals store and stream."""
+
+import json
+from collections import Counter
+
+import pytest
+from singer_sdk.streams import RESTStream
+
+from tap_dg_ice import client
+from tap_dg_ice.holder_totals import HolderTotalsStore, parse_balance
+from tap_dg_ice.tap import TapTapDgIce
+
+CHAINS = ["ethereum", "polygon"]
+
+
+def test_totals_sum_across_chains_and_only_moved_accounts_are_emitted():
+    store = HolderTotalsStore(CHAINS)
+    store.apply("ethereum", "dg-alice", "alice", 10**30)
+    store.apply("polygon", "dg-alice", "alice", 5)
+    store.apply("polygon", "dg-bob", "bob", 7)
+
+    moved = {row["account"]: row for row in store.drain_moved()}
+    assert moved["alice"]["total"] == 10**30 + 5
+    assert moved["alice"]["chains"] == {"ethereum": 10**30, "polygon": 5}
+    assert moved["bob"]["total"] == 7
+
+    assert store.apply("polygon", "dg-bob", "bob", 7) is False
+    assert store.apply("polygon", "dg-alice", "alice", 1) is True
+    assert [row["account"] for row in store.drain_moved()] == ["alice"]
+    assert list(store.drain_moved()) == []
+
+
+def test_store_round_trips_through_disk(tmp_path):
+    path = tmp_path / "totals.json"
+    store = HolderTotalsStore(CHAINS, path)
+    store.apply("ethereum", "dg-alice", "alice", 3)
+    store.apply("polygon", "dg-alice", "alice", parse_balance("1.5"))
+    store.save()
+
+    reloaded = HolderTotalsStore(CHAINS, path)
+    assert reloaded.version == store.version is not None
+    assert reloaded.apply("ethereum", "dg-alice", "alice", 3) is False
+    assert reloaded.apply("ethereum", "dg-alice", "alice", 4) is True
+    (row,) = reloaded.drain_moved()
+    assert row["total"] == parse_balance("5.5")
+
+
+ETH_URL = "https://eth.subgraph.test"
+POLYGON_URL = "https://polygon.subgraph.test"
+BALANCES = {
+    ETH_URL: [("dg-alice", "alice", "10"), ("dg-bob", "bob", "5")],
+    POLYGON_URL: [("dg-alice", "alice", "2")],
+}
+HOLDER_STREAMS = ["dg_token_holders_ethereum", "dg_token_holders_polygon"]
+TOTALS_STREAM = "dg_token_holders_totals"
+
+
+@pytest.fixture
+def subgraphs(monkeypatch):
+    """Fake balance subgraphs at a fixed block; `queries` counts reads per URL."""
+    queries = Counter()
+
+    def request_records(stream, context):
+        queries[stream.url_base] += 1
+        for row_id, account, balance in BALANCES[stream.url_base]:
+            yield {
+                "id": row_id,
+                "account": {"id": account},
+                "token": {"id": "dg"},
+                "balance": balance,
+            }
+
+    monkeypatch.setattr(RESTStream, "request_records", request_records)
+    monkeypatch.setattr(
+        client.indexing_status,
+        "get",
+        lambda url, engine, session, headers: {"number": 100, "timestamp": 0},
+    )
+    return queries
+
+
+def sync(tmp_path, capsys, state=None, deselected=()):
+    """Run `sync_all` over the holder and totals streams; return the tap and totals."""
+    catalog = json.loads(json.dumps(TapTapDgIce(config={}).catalog_dict))
+    for stream in catalog["streams"]:
+        name = stream["tap_stream_id"]
+        if name in deselected or name not in HOLDER_STREAMS + [TOTALS_STREAM]:
+            deselect = {"breadcrumb": [], "metadata": {"selected": False}}
+            stream["metadata"].append(deselect)
+    tap = TapTapDgIce(
+        config={
+            "dg_token_eth": ETH_URL,
+            "dg_token_polygon": POLYGON_URL,
+            "holder_totals_store": str(tmp_path / "totals.json"),
+        },
+        catalog=catalog,
+        state=state,
+        parse_env_config=False,
+    )
+    capsys.readouterr()
+    tap.sync_all()
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    totals = {
+        message["record"]["id"]: message["record"]["balance"]
+        for message in messages
+        if message["type"] == "RECORD"
+        and message["stream"] == TOTALS_STREAM
+    }
+    return tap, totals
+
+
+def test_totals_are_fed_by_the_holder_streams(tmp_path, capsys, subgraphs):
+    _, totals = sync(tmp_path, capsys)
+
+    assert totals == {"alice": "12", "bob": "5"}
+    assert subgraphs == {ETH_URL: 1, POLYGON_URL: 1}
+
+
+def test_chain_without_selected_holder_stream_is_read_by_totals(
+    tmp_path, capsys, subgraphs
+):
+    _, totals = sync(tmp_path, capsys, deselected=["dg_token_holders_polygon"])
+
+    assert totals == {"alice": "12", "bob": "5"}
+    assert subgraphs == {ETH_URL: 1, POLYGON_URL: 1}
+
+
+def test_unchanged_run_emits_nothing_and_fresh_state_emits_everything(
+    tmp_path, capsys, subgraphs
+):
+    first, _ = sync(tmp_path, capsys)
+    state = json.loads(json.dumps(first.state))
+
+    _, totals = sync(tmp_path, capsys, state=state)
+    assert totals == {}
+    assert subgraphs == {ETH_URL: 1, POLYGON_URL: 1}
+
+    _, totals = sync(tmp_path, capsys)
+    assert totals == {"alice": "12", "bob": "5"}
+
+
+def test_lost_store_is_rebuilt_although_subgraphs_are_unchanged(
+    tmp_path, capsys, subgraphs
+):
+    first, _ = sync(tmp_path, capsys)
+    state = json.loads(json.dumps(first.state))
+    (tmp_path / "totals.json").unlink()
+
+    second, totals = sync(tmp_path, capsys, state=state)
+    assert totals == {"alice": "12", "bob": "5"}
+    assert subgraphs == {ETH_URL: 2, POLYGON_URL: 2}
+
+    state = json.loads(json.dumps(second.state))
+    _, totals = sync(tmp_path, capsys, state=state)
+    assert totals == {}
+    assert subgraphs == {ETH_URL: 2, POLYGON_URL: 2}
+
+
+def test_balance_changes_are_totalled_in_the_run_that_reads_them(
+    tmp_path, capsys, subgraphs, monkeypatch
+):
+    block = {"number": 100}
+    monkeypatch.setattr(
+        client.indexing_status,
+        "get",
+        lambda url, engine, session, headers: {**block, "timestamp": 0},
+    )
+    runs = []
+    state = None
+    for number, eth_alice in [(100, "10"), (101, "20"), (101, "20"), (102, "20")]:
+        block["number"] = number
+        eth_rows = [("dg-alice", "alice", eth_alice), ("dg-bob", "bob", "5")]
+        monkeypatch.setitem(BALANCES, ETH_URL, eth_rows)
+        tap, totals = sync(tmp_path, capsys, state=state)
+        state = json.loads(json.dumps(tap.state))
+        runs.append((totals, dict(subgraphs)))
+
+    assert runs == [
+        ({"alice": "12", "bob": "5"}, {ETH_URL: 1, POLYGON_URL: 1}),
+        ({"alice": "22"}, {ETH_URL: 2, POLYGON_URL: 2}),
+        ({}, {ETH_URL: 2, POLYGON_URL: 2}),
+        ({}, {ETH_URL: 3, POLYGON_URL: 3}),
+    ]
@@ -0,0 +1,155 @@
+"""Tests for the payment logs child of the secondary revenue stream."""
+
+import json
+
+from singer_sdk.streams import RESTStream
+
+from tap_dg_ice import timestamped_streams
+from tap_dg_ice.getSecondaryRevenue import (
+    getSecondaryRevenue,
+    scalePaymentLogs,
+    summarizePaymentLogs,
+)
+from tap_dg_ice.tap import TapTapDgIce
+from tap_dg_ice.timestamped_streams import (
+    SecondaryRevenueICETransfer,
+    SecondaryRevenuePaymentLogs,
+)
+
+USDC = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
+DG_WALLET_TOPIC = "0x0000000000000000000000007a61a0ed364e599ae4748d1ebe74bf236dd27b09"
+
+
+def payment_log(amount, log_index):
+    return {
+        "address": USDC,
+        "topics": ["0x" + "00" * 32, "0x" + "00" * 32, DG_WALLET_TOPIC],
+        "data": hex(amount),
+        "logIndex": hex(log_index),
+    }
+
+
+RECEIPTS = {
+    "0xa": {"status": "0x1", "logs": [payment_log(1_000_000, 1), payment_log(5, 2)]},
+    "0xb": {"status": "0x1", "logs": [payment_log(2_000_000, 7)]},
+}
+
+
+def test_parent_fetches_each_receipt_once_and_child_makes_no_rpc(
+    monkeypatch, capsys
+):
+    receipt_calls, child_contexts = [], []
+
+    def request_records(stream, context):
+        for number, transaction in enumerate(RECEIPTS):
+            yield {"id": transaction, "timestamp": str(number), "value": "1"}
+
+    def get_receipts(transaction_id, rpc_pool):
+        receipt_calls.append(transaction_id)
+        return RECEIPTS[transaction_id]
+
+    child_get_records = SecondaryRevenuePaymentLogs.get_records
+
+    def spy_get_records(stream, context):
+        child_contexts.append(context)
+        return child_get_records(stream, context)
+
+    monkeypatch.setattr(RESTStream, "request_records", request_records)
+    monkeypatch.setattr(timestamped_streams, "getReceipts", get_receipts)
+    monkeypatch.setattr(
+        SecondaryRevenueICETransfer,
+        "get_token_metadata",
+        lambda stream, addresses: {USDC: {"decimals": 6, "symbol": "USDC"}},
+    )
+    monkeypatch.setattr(SecondaryRevenuePaymentLogs, "get_records", spy_get_records)
+
+    tap = TapTapDgIce(
+        config={"skip_unchanged_subgraphs": False, "token_metadata_cache": ""},
+        parse_env_config=False,
+    )
+    tap.streams["secondary_revenue_ice_transfer"].sync()
+
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    rows = [
+        message["record"]
+        for message in messages
+        if message["type"] == "RECORD"
+        and message["stream"] == "secondary_revenue_payment_logs"
+    ]
+    assert receipt_calls == ["0xa", "0xb"]
+    assert [(row["transactionId"], row["paymentTokenAmount"]) for row in rows] == [
+        ("0xa", "1"),
+        ("0xa", "0.000005"),
+        ("0xb", "2"),
+    ]
+    assert child_contexts == [{"transactionId": "0xa"}, {"transactionId": "0xb"}]
+    child_state = tap.state["bookmarks"]["secondary_revenue_payment_logs"]
+    assert "partitions" not in child_state
+
+
+def test_no_receipts_are_fetched_when_amount_and_address_are_deselected(
+    monkeypatch, capsys
+):
+    def request_records(stream, context):
+        yield {"id": "0xa", "timestamp": "0", "value": "1"}
+
+    def get_receipts(transaction_id, rpc_pool):
+        raise AssertionError(f"fetched receipt {transaction_id}")
+
+    monkeypatch.setattr(RESTStream, "request_records", request_records)
+    monkeypatch.setattr(timestamped_streams, "getReceipts", get_receipts)
+
+    catalog = json.loads(json.dumps(TapTapDgIce(config={}).catalog_dict))
+    for stream in catalog["streams"]:
+        if stream["tap_stream_id"] == "secondary_revenue_ice_transfer":
+            for name in ("paymentTokenAddress", "paymentTokenAmount"):
+                stream["metadata"].append(
+                    {
+                        "breadcrumb": ["properties", name],
+                        "metadata": {"selected": False},
+                    }
+                )
+        if stream["tap_stream_id"] == "secondary_revenue_payment_logs":
+            stream["metadata"].append(
+                {"breadcrumb": [], "metadata": {"selected": False}}
+            )
+    tap = TapTapDgIce(
+        config={"skip_unchanged_subgraphs": False},
+        catalog=catalog,
+        parse_env_config=False,
+    )
+    transfers = tap.streams["secondary_revenue_ice_transfer"]
+    assert transfers.is_property_selected("paymentTokenSymbol")
+    transfers.sync()
+
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    (record,) = [m["record"] for m in messages if m["type"] == "RECORD"]
+    assert record["id"] == "0xa"
+
+
+def test_summary_only_adds_amounts_of_the_same_token():
+    other = "0x8f3Cf7ad23Cd3CaDbD9735AFf958023239c6A063"
+    paymentLogs = scalePaymentLogs(
+        [
+            {"logIndex": 1, "paymentTokenAddress": other, "amount": 10**18},
+            {"logIndex": 2, "paymentTokenAddress": USDC, "amount": 1_500_000},
+            {"logIndex": 3, "paymentTokenAddress": USDC, "amount": 500_000},
+        ],
+        {USDC: {"decimals": 6, "symbol": "USDC"}, other: {"decimals": 18}},
+    )
+
+    assert summarizePaymentLogs(paymentLogs) == {
+        "paymentTokenAmount": "2",
+        "paymentTokenAddress": USDC,
+        "paymentTokenSymbol": "USDC",
+    }
+
+
+def test_get_secondary_revenue_resolves_token_decimals():
+    class FakeResolver:
+        def resolve(self, addresses):
+            assert addresses == [USDC]
+            return {USDC: {"decimals": 6, "symbol": "USDC"}}
+
+    revenue = getSecondaryRevenue("0xb", RECEIPTS["0xb"], tokenMetadata=FakeResolver())
+    assert revenue["paymentTokenAmount"] == "2"
@@ -0,0 +1,82 @@
+"""Tests for sync timing spans and the folded stack output."""
+
+import logging
+import time
+
+import requests
+
+from tap_dg_ice.profiling import SamplingProfiler, SpanRecorder, profile_sync, profiler
+from tap_dg_ice.tap import TapTapDgIce
+
+
+def slow_rows(count, delay):
+    for row in range(count):
+        time.sleep(delay)
+        yield row
+
+
+def test_report_counts_calls_and_times_only_the_iterator():
+    recorder = SpanRecorder()
+    recorder.enabled = True
+    with recorder.span("nft_items", "fetch"):
+        time.sleep(0.01)
+    for _ in recorder.iterate("nft_items", "parse", slow_rows(3, 0.01)):
+        time.sleep(0.05)
+
+    report = recorder.report()
+    assert report["nft_items"]["fetch"]["calls"] == 1
+    assert report["nft_items"]["fetch"]["seconds"] >= 0.01
+    assert report["nft_items"]["parse"]["calls"] == 4
+    assert 0.03 <= report["nft_items"]["parse"]["seconds"] < 0.15
+    assert "nft_items" in recorder.format_report()
+
+
+def test_disabled_recorder_does_not_wrap_iterables():
+    rows = [1, 2]
+    assert SpanRecorder().iterate("nft_items", "parse", rows) is rows
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profile_sync_writes_spans_and_folded_stacks(tmp_path):
+    with profile_sync(tmp_path, logging.getLogger("test"), interval=0.001):
+        with profiler.span("nft_items", "emit"):
+            busy_wait(0.2)
+
+    assert "emit" in (tmp_path / "spans.json").read_text()
+    lines = (tmp_path / "profile.folded").read_text().splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1] == "test_profiling.py:busy_wait"
+
+
+def test_write_folded_orders_stacks_by_count(tmp_path):
+    sampler = SamplingProfiler(0)
+    sampler.samples.update({"a;b": 2, "a;c": 5})
+    sampler.write_folded(tmp_path / "out.folded")
+
+    assert (tmp_path / "out.folded").read_text() == "a;c 5\na;b 2\n"
+
+
+def test_every_stream_times_parse_and_emit(monkeypatch):
+    recorder = SpanRecorder()
+    recorder.enabled = True
+    monkeypatch.setattr("tap_dg_ice.client.profiler", recorder)
+    tap = TapTapDgIce(config={}, parse_env_config=False)
+    response = requests.Response()
+    response._content = b'{"data": {"nftitems": [{"id": "1", "createdAt": "5"}]}}'
+
+    assert list(tap.streams["nft_items"].parse_response(response)) == [
+        {"id": "1", "createdAt": "5"}
+    ]
+    tap.streams["secondary_revenue_payment_logs"]._write_record_message(
+        {"transactionId": "0x1", "logIndex": 0}
+    )
+
+    report = recorder.report()
+    assert report["nft_items"]["parse"]["calls"] == 2
+    assert report["secondary_revenue_payment_logs"]["emit"]["calls"] == 1
@@ -0,0 +1,104 @@
+"""Tests for GraphQL selection sets generated from the catalog selection."""
+
+import json
+
+import pytest
+
+from tap_dg_ice.tap import TapTapDgIce
+
+# Field sets of the hand-written queries the generated ones replaced.
+PREVIOUS_FIELDS = {
+    "ice_level_transfer_events": (
+        "id oldOwner.address newOwner.address tokenAddress.address tokenId timestamp"
+    ),
+    "ice_initial_minting_event": (
+        "id tokenId mintCount mintPrice tokenOwner.id timestamp paymentToken"
+    ),
+    "ice_upgrade_item_event": (
+        "id itemId issuedId tokenOwner.id tokenId tokenAddress.address requestIndex "
+        "timestamp"
+    ),
+    "ice_upgrade_resolved_events": (
+        "id newItemId newTokenId tokenOwner.id tokenAddress.address timestamp"
+    ),
+    "nft_items": "id owner.id token.id tokenId level createdAt",
+    "secondary_revenue_ice_transfer": (
+        "id to.id from.id tokenId tokenAddress value contractAddress blockNumber "
+        "timestamp isICE"
+    ),
+    "dg_token_holders_ethereum": "id account.id token.id balance",
+    "dg_token_holders_polygon": "id account.id token.id balance",
+}
+
+
+def field_paths(query):
+    """Return the dotted leaf field paths requested by `query`."""
+    selection = query[query.index("{", query.rindex(")")) :]
+    tokens = selection.replace("{", " { ").replace("}", " } ").split()[1:-2]
+    paths, parents, previous = set(), [], None
+    for token in tokens:
+        if token == "{":
+            paths.discard(".".join(parents + [previous]))
+            parents.append(previous)
+        elif token == "}":
+            parents.pop()
+        else:
+            paths.add(".".join(parents + [token]))
+            previous = token
+    return paths
+
+
+def tap_with(stream_name, deselected=()):
+    """Build the tap with the given property breadcrumbs of a stream deselected."""
+    catalog = json.loads(json.dumps(TapTapDgIce(config={}).catalog_dict))
+    (stream,) = [s for s in catalog["streams"] if s["tap_stream_id"] == stream_name]
+    for breadcrumb in deselected:
+        stream["metadata"].append(
+            {"breadcrumb": list(breadcrumb), "metadata": {"selected": False}}
+        )
+    return TapTapDgIce(config={}, catalog=catalog, parse_env_config=False)
+
+
+@pytest.mark.parametrize("stream_name", sorted(PREVIOUS_FIELDS))
+def test_full_catalog_requests_the_previous_fields(stream_name):
+    stream = TapTapDgIce(config={}, parse_env_config=False).streams[stream_name]
+
+    assert field_paths(stream.query) == set(PREVIOUS_FIELDS[stream_name].split())
+
+
+def test_deselected_nested_field_drops_its_object():
+    owner_id = ("properties", "owner", "properties", "id")
+    stream = tap_with("nft_items", [owner_id]).streams["nft_items"]
+
+    assert not stream.mask[owner_id]
+    assert field_paths(stream.query) == {
+        "id",
+        "token.id",
+        "tokenId",
+        "level",
+        "createdAt",
+    }
+
+
+def test_keys_stay_in_the_query_when_deselected():
+    tap = tap_with(
+        "nft_items",
+        [("properties", name) for name in ("id", "createdAt", "owner", "level")],
+    )
+    stream = tap.streams["nft_items"]
+
+    assert not stream.is_property_selected("createdAt")
+    assert field_paths(stream.query) == {"id", "token.id", "tokenId", "createdAt"}
+
+
+def test_pagination_key_is_always_fetched():
+    transfers = tap_with(
+        "secondary_revenue_ice_transfer", [("properties", "value")]
+    ).streams["secondary_revenue_ice_transfer"]
+    assert "value" not in field_paths(transfers.query)
+    assert "paymentTokenAmount" not in field_paths(transfers.query)
+
+    holders = tap_with("dg_token_holders_ethereum", [("properties", "id")]).streams[
+        "dg_token_holders_ethereum"
+    ]
+    assert "id" in field_paths(holders.query)
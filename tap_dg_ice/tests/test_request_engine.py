@@ -0,0 +1,110 @@
+"""Tests for RequestEngine retry classification, budgets, hooks and rate limits."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from tap_dg_ice.client import IndexingStatusCache
+from tap_dg_ice.request_engine import RateLimiter, RequestEngine, RetryableResponseError
+
+
+@pytest.fixture
+def server():
+    """Local HTTP server answering with scripted status codes, then 200."""
+    script = {"statuses": [], "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            script["requests"] += 1
+            status = script["statuses"].pop(0) if script["statuses"] else 200
+            data = json.dumps({"data": {"_meta": {"block": {"number": 7}}}}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    script["url"] = f"http://127.0.0.1:{httpd.server_port}/"
+    yield script
+    httpd.shutdown()
+
+
+def send(engine, url, **kwargs):
+    with requests.Session() as session:
+        prepared = session.prepare_request(requests.Request("POST", url, json={}))
+        return engine.send(session, prepared, **kwargs)
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_statuses_are_retried_until_success(server, status):
+    server["statuses"] = [status, status]
+    engine = RequestEngine(max_tries=5, factor=0.01)
+
+    assert send(engine, server["url"]).status_code == 200
+    assert server["requests"] == 3
+
+
+@pytest.mark.parametrize("status", [401, 404])
+def test_permanent_statuses_fail_immediately(server, status):
+    server["statuses"] = [status]
+    engine = RequestEngine(max_tries=5, factor=0.01)
+
+    with pytest.raises(RuntimeError) as excinfo:
+        send(engine, server["url"])
+    assert not isinstance(excinfo.value, RetryableResponseError)
+    assert server["requests"] == 1
+
+
+def test_max_time_stops_retries(server):
+    server["statuses"] = [503] * 100
+    engine = RequestEngine(max_tries=100, factor=0.2, max_time=0.5)
+
+    started = time.perf_counter()
+    with pytest.raises(RetryableResponseError):
+        send(engine, server["url"])
+    assert time.perf_counter() - started < 2
+    assert server["requests"] < 100
+
+
+def test_hooks_are_called_once_per_attempt(server):
+    server["statuses"] = [503]
+    engine_calls, request_calls = [], []
+    engine = RequestEngine(
+        max_tries=3, factor=0.01, on_response=lambda *args: engine_calls.append(args)
+    )
+
+    send(engine, server["url"], on_response=lambda *args: request_calls.append(args))
+    assert [call[1].status_code for call in engine_calls] == [503, 200]
+    assert len(request_calls) == 2
+
+
+def test_rate_limiter_spaces_requests(server):
+    engine = RequestEngine(rate_limiter=RateLimiter(20))
+
+    started = time.perf_counter()
+    for _ in range(5):
+        send(engine, server["url"])
+    assert time.perf_counter() - started >= 0.2
+
+
+def test_indexing_status_goes_through_the_engine(server):
+    server["statuses"] = [503]
+    hook_calls = []
+    engine = RequestEngine(
+        max_tries=3, factor=0.01, on_response=lambda *args: hook_calls.append(args)
+    )
+
+    with requests.Session() as session:
+        block = IndexingStatusCache().get(server["url"], engine, session, {})
+    assert block == {"number": 7}
+    assert len(hook_calls) == 2
@@ -0,0 +1,135 @@
+"""Tests for RpcPool hedging and failover against local JSON-RPC servers."""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tap_dg_ice.rpc_pool import RpcError, RpcPool
+
+
+def start_rpc_server(delay=0.0, status=200, name="server", error=None, reply=None):
+    """Start a local JSON-RPC server answering every call with `name`.
+
+    With `error`, every call is answered with that JSON-RPC error instead; with
+    `reply`, every request gets that fixed body.
+    """
+
+    def answer(request):
+        if error is not None:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": error}
+        return {"jsonrpc": "2.0", "id": request["id"], "result": name}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(delay)
+            if reply is not None:
+                body = reply
+            elif isinstance(payload, list):
+                body = [answer(request) for request in payload]
+            else:
+                body = answer(payload)
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+
+@pytest.fixture
+def servers():
+    started = []
+
+    def start(**kwargs):
+        server, url = start_rpc_server(**kwargs)
+        started.append(server)
+        return url
+
+    yield start
+    for server in started:
+        server.shutdown()
+
+
+def test_hedges_to_second_endpoint_when_first_is_slow(servers):
+    slow = servers(delay=2.0, name="slow")
+    fast = servers(name="fast")
+    pool = RpcPool([slow, fast], hedge_after=0.1)
+
+    started = time.perf_counter()
+    assert pool.call("eth_blockNumber", []) == "fast"
+    assert time.perf_counter() - started < 1.0
+
+
+def test_fails_over_from_erroring_endpoint(servers):
+    broken = servers(status=500, name="broken")
+    healthy = servers(name="healthy")
+    pool = RpcPool([broken, healthy], hedge_after=5)
+
+    assert pool.call("eth_blockNumber", []) == "healthy"
+    assert pool.endpoints[0].failures == 1
+
+
+def test_prefers_lower_latency_endpoint(servers):
+    slower = servers(delay=0.05, name="slower")
+    faster = servers(name="faster")
+    pool = RpcPool([slower, faster], hedge_after=5)
+    for endpoint in pool.endpoints:
+        for _ in range(10):
+            pool._post(endpoint, pool._request("eth_blockNumber", []))
+
+    assert pool.ranked_endpoints()[0].url == faster
+    assert pool.call("eth_blockNumber", []) == "faster"
+
+
+def test_batch_returns_results_in_order(servers):
+    pool = RpcPool([servers(name="only")])
+
+    assert pool.batch([("eth_call", []), ("eth_call", [])]) == ["only", "only"]
+
+
+def test_raises_when_every_endpoint_fails(servers):
+    pool = RpcPool([servers(status=500), servers(status=503)], hedge_after=5)
+
+    with pytest.raises(RpcError):
+        pool.call("eth_blockNumber", [])
+
+
+def test_json_rpc_error_in_200_response_fails_over(servers):
+    limited = servers(error={"code": -32005, "message": "rate limit exceeded"})
+    healthy = servers(name="healthy")
+    pool = RpcPool([limited, healthy], hedge_after=5)
+
+    assert pool.call("eth_blockNumber", []) == "healthy"
+    assert pool.batch([("eth_call", [])]) == ["healthy"]
+    assert pool.endpoints[0].failures == 2
+    assert pool.endpoints[0].successes == 0
+
+
+def test_non_list_batch_response_fails_over(servers):
+    error = {"code": -32600, "message": "batch too large"}
+    broken = servers(reply={"jsonrpc": "2.0", "id": None, "error": error})
+    healthy = servers(name="healthy")
+    pool = RpcPool([broken, healthy], hedge_after=5)
+
+    assert pool.batch([("eth_call", []), ("eth_call", [])]) == ["healthy", "healthy"]
+    assert pool.endpoints[0].failures == 1
+
+
+def test_reverted_calls_are_answers_not_endpoint_failures(servers):
+    pool = RpcPool([servers(error={"code": 3, "message": "execution reverted"})])
+
+    assert pool.batch([("eth_call", []), ("eth_call", [])]) == [None, None]
+    with pytest.raises(RpcError):
+        pool.call("eth_call", [])
+    assert pool.endpoints[0].failures == 0
@@ -0,0 +1,78 @@
+"""Tests for skipping polls of subgraphs that have not indexed new blocks."""
+
+import logging
+
+import pytest
+from singer_sdk.streams import RESTStream
+
+from tap_dg_ice import client
+from tap_dg_ice.follow import FollowScheduler
+from tap_dg_ice.tap import TapTapDgIce
+
+URL = "https://subgraph.test/nft"
+
+
+@pytest.fixture
+def subgraph(monkeypatch):
+    """Fake subgraph: `block` is its indexed block, `queries` counts requests."""
+    fake = {"block": 100, "queries": 0}
+
+    def request_records(stream, context):
+        fake["queries"] += 1
+        yield {"id": f"item-{fake['queries']}", "createdAt": fake["queries"]}
+
+    monkeypatch.setattr(RESTStream, "request_records", request_records)
+    monkeypatch.setattr(
+        client.indexing_status,
+        "get",
+        lambda url, engine, session, headers: {"number": fake["block"], "timestamp": 0},
+    )
+    return fake
+
+
+def nft_items(**config):
+    tap = TapTapDgIce(config={"api_url": URL, **config}, parse_env_config=False)
+    return tap.streams["nft_items"]
+
+
+def test_unchanged_subgraph_is_not_queried_again(subgraph, capsys):
+    stream = nft_items()
+    assert len(list(stream.get_records(None))) == 1
+    assert stream.stream_state["indexed_blocks"] == {URL: 100}
+
+    assert list(stream.get_records(None)) == []
+    assert subgraph["queries"] == 1
+
+
+def test_advanced_subgraph_is_queried(subgraph):
+    stream = nft_items()
+    list(stream.get_records(None))
+    subgraph["block"] = 101
+
+    assert len(list(stream.get_records(None))) == 1
+    assert stream.stream_state["indexed_blocks"] == {URL: 101}
+
+
+def test_min_block_advance_and_opt_out(subgraph):
+    stream = nft_items(subgraph_min_block_advance=10)
+    list(stream.get_records(None))
+    subgraph["block"] = 109
+    assert list(stream.get_records(None)) == []
+    subgraph["block"] = 110
+    assert len(list(stream.get_records(None))) == 1
+
+    always = nft_items(skip_unchanged_subgraphs=False)
+    list(always.get_records(None))
+    list(always.get_records(None))
+    assert subgraph["queries"] == 4
+
+
+def test_skipped_follow_poll_counts_as_idle(subgraph, capsys):
+    stream = nft_items()
+    scheduler = FollowScheduler([stream], {}, logging.getLogger("test"))
+
+    assert scheduler.poll(stream) is True
+    assert scheduler.poll(stream) is False
+    subgraph["block"] = 101
+    assert scheduler.poll(stream) is True
+    assert subgraph["queries"] == 2
@@ -0,0 +1,78 @@
+"""Tests for ERC-20 metadata decoding, caching and exact amount scaling."""
+
+import pytest
+
+from tap_dg_ice.rpc_pool import RpcError
+from tap_dg_ice.token_metadata import (
+    TokenMetadataResolver,
+    decode_string,
+    decode_uint,
+    format_amount,
+    scale_amount,
+)
+
+USDC = "0x2791Bca1f2de4661ED88A30C99A7a9449Aa84174"
+UINT_6 = "0x" + "6".rjust(64, "0")
+STRING_USDC = (
+    "0x" + "20".rjust(64, "0") + "4".rjust(64, "0") + b"USDC".hex().ljust(64, "0")
+)
+
+
+class FakeRpcPool:
+    def __init__(self, results):
+        self.results = results
+        self.batches = []
+
+    def batch(self, calls):
+        self.batches.append(calls)
+        if isinstance(self.results, Exception):
+            raise self.results
+        return self.results[: len(calls)]
+
+
+def test_scale_amount_is_exact():
+    assert format_amount(scale_amount(1_500_000, 6)) == "1.5"
+    assert format_amount(scale_amount(123456789012345678901234567890, 18)) == (
+        "123456789012.34567890123456789"
+    )
+    assert format_amount(scale_amount(0, 18)) == "0"
+
+
+def test_decode_results():
+    assert decode_uint(UINT_6) == 6
+    assert decode_uint("0x") is None
+    assert decode_string(STRING_USDC) == "USDC"
+    assert decode_string("0x" + b"MKR".hex().ljust(64, "0")) == "MKR"
+
+
+def test_resolver_memoizes_and_persists(tmp_path):
+    cache_path = tmp_path / "tokens.json"
+    pool = FakeRpcPool([UINT_6, STRING_USDC])
+    resolver = TokenMetadataResolver(pool, cache_path)
+
+    assert resolver.resolve([USDC]) == {USDC: {"decimals": 6, "symbol": "USDC"}}
+    resolver.resolve([USDC])
+    assert len(pool.batches) == 1
+
+    warm_pool = FakeRpcPool([])
+    warm = TokenMetadataResolver(warm_pool, cache_path).resolve([USDC])
+    assert warm[USDC]["decimals"] == 6
+    assert warm_pool.batches == []
+
+
+def test_failed_lookup_is_not_cached_or_persisted(tmp_path):
+    cache_path = tmp_path / "tokens.json"
+    failing_pool = FakeRpcPool(RpcError("every endpoint failed"))
+    resolver = TokenMetadataResolver(failing_pool, cache_path)
+
+    with pytest.raises(RpcError):
+        resolver.resolve([USDC])
+    assert not cache_path.exists()
+
+    resolver.rpc_pool = FakeRpcPool([UINT_6, STRING_USDC])
+    assert resolver.resolve([USDC])[USDC]["decimals"] == 6
+
+
+def test_only_missing_decimals_fall_back_to_18():
+    resolver = TokenMetadataResolver(FakeRpcPool(["0x", None]))
+    assert resolver.resolve([USDC]) == {USDC: {"decimals": 18, "symbol": None}}
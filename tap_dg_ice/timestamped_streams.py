@@ -5,13 +5,22 @@ import datetime
 import logging
 import backoff, requests
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, List, Iterable, cast
+from typing import Any, Dict, Optional, Union, List, Iterable, Set, cast
 
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
-from tap_dg_ice.client import TapDgIceStream
-from singer_sdk.streams import RESTStream
-from tap_dg_ice.getSecondaryRevenue import getSecondaryRevenue
+from tap_dg_ice.client import StreamMetricsMixin, TapDgIceStream
+from singer_sdk.streams import RESTStream, Stream
+from tap_dg_ice.profiling import profiler
+from tap_dg_ice.getSecondaryRevenue import (
+    default_rpc_pool,
+    getPaymentLogs,
+    getReceipts,
+    scalePaymentLogs,
+    summarizePaymentLogs,
+)
+from tap_dg_ice.rpc_pool import DEFAULT_TIMEOUT, RpcPool
+from tap_dg_ice.token_metadata import TokenMetadataResolver, format_amount
 
 class IceTransferEvents(TapDgIceStream):
     """Define custom stream."""
@@ -22,30 +31,11 @@ class IceTransferEvents(TapDgIceStream):
     replication_method = "INCREMENTAL"
     is_sorted = True
     object_returned = 'iceLevelTransferEvents'
-    query = """
-    query ($timestamp: Int!)
-        {
-            iceLevelTransferEvents(
-                first: 1000,
-                    orderBy: timestamp,
-                    orderDirection: asc,
-                    where:{
-                        timestamp_gte: $timestamp
-            }) {
-                id
-                oldOwner{
-                    address
-                }
-                newOwner{
-                    address
-                }
-                tokenAddress {
-                    address
-                }
-                tokenId
-                timestamp
-            }
-        }
+    query_arguments = """
+        first: 1000,
+        orderBy: timestamp,
+        orderDirection: asc,
+        where: { timestamp_gte: $timestamp }
     """
 
     schema = th.PropertiesList(
@@ -79,28 +69,12 @@ class InitialMintingEvent(TapDgIceStream):
     is_sorted = True
     object_returned = 'initialMintingEvents'
 
-    query = """
-        query ($timestamp: Int!)
-            {
-                initialMintingEvents(
-                    first: 1000,
-                        orderBy: timestamp,
-                        orderDirection: asc,
-                        where:{
-                            timestamp_gte: $timestamp
-                }) {
-                        id
-                        tokenId
-                        mintCount
-                        mintPrice
-                        tokenOwner {
-                            id
-                        }
-                        timestamp
-                        paymentToken
-                }
-            }
-        """
+    query_arguments = """
+        first: 1000,
+        orderBy: timestamp,
+        orderDirection: asc,
+        where: { timestamp_gte: $timestamp }
+    """
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -129,30 +103,11 @@ class UpgradeItemEvent(TapDgIceStream):
     replication_method = "INCREMENTAL"
     is_sorted = True
     object_returned = 'upgradeItemEvents'
-    query = """
-        query ($timestamp: Int!)
-            {
-                upgradeItemEvents(
-                    first: 1000,
-                        orderBy: timestamp,
-                        orderDirection: asc,
-                        where:{
-                            timestamp_gte: $timestamp
-                }) {
-                        id
-                        itemId
-                        issuedId
-                        tokenOwner{
-                            id
-                        }
-                        tokenId
-                            tokenAddress{
-                            address
-                        }
-                        requestIndex
-                        timestamp
-                }
-            }
+    query_arguments = """
+        first: 1000,
+        orderBy: timestamp,
+        orderDirection: asc,
+        where: { timestamp_gte: $timestamp }
     """
 
     schema = th.PropertiesList(
@@ -186,28 +141,11 @@ class UpgradeResolvedEvents(TapDgIceStream):
     replication_method = "INCREMENTAL"
     is_sorted = True
     object_returned = 'upgradeResolvedEvents'
-    query = """
-    query ($timestamp: Int!)
-        {
-            upgradeResolvedEvents(
-                first: 1000,
-                    orderBy: timestamp,
-                    orderDirection: asc,
-                    where:{
-                        timestamp_gte: $timestamp
-            }) {
-                    id
-                    newItemId
-                    newTokenId
-                    tokenOwner {
-                    id
-                    }
-                    tokenAddress {
-                    address
-                    }
-                    timestamp
-            }
-        }
+    query_arguments = """
+        first: 1000,
+        orderBy: timestamp,
+        orderDirection: asc,
+        where: { timestamp_gte: $timestamp }
     """
 
     schema = th.PropertiesList(
@@ -240,33 +178,17 @@ class NFTItems(TapDgIceStream):
     replication_method = "INCREMENTAL"
     is_sorted = True
     object_returned = 'nftitems'
-    query = """
-        query ($timestamp: Int!)
-        {
-            nftitems(
-                first: 1000,
-                    orderBy: createdAt,
-                    orderDirection: asc,
-                    where:{
-                        createdAt_gte: $timestamp
-            }) {
-                id
-                owner {
-                    id
-                }
-                token {
-                    id
-                }
-                tokenId
-                level
-                createdAt
-            }
-        }
+    query_arguments = """
+        first: 1000,
+        orderBy: createdAt,
+        orderDirection: asc,
+        where: { createdAt_gte: $timestamp }
     """
 
     def post_process(self, row: dict, context: Optional[dict] = None) -> dict:
         """Convert level to integer"""
-        row['level'] = int(row['level'])
+        if 'level' in row:
+            row['level'] = int(row['level'])
         return row
 
     schema = th.PropertiesList(
@@ -312,55 +234,114 @@ class SecondaryRevenueICETransfer(TapDgIceStream):
     replication_method = "INCREMENTAL"
     is_sorted = True
     object_returned = 'transferEvents'
-    query = """
-    query ($timestamp: Int!)
-        {
-            transferEvents(
-                first:1000,
-                orderBy: timestamp,
-                orderDirection: asc,
-                where:{
-                    timestamp_gte: $timestamp
-                }) {
-                id
-                to {
-                    id
-                }
-                from {
-                    id
-                }
-                tokenId
-                tokenAddress
-                value
-                contractAddress
-                blockNumber
-                timestamp
-                isICE
-            }
+    query_arguments = """
+        first: 1000,
+        orderBy: timestamp,
+        orderDirection: asc,
+        where: { timestamp_gte: $timestamp }
+    """
+    enriched_properties = ["paymentTokenAddress", "paymentTokenAmount", "paymentTokenSymbol"]
 
-        }
+    @property
+    def needs_receipts(self) -> bool:
+        """Return True if the payment amount, address or child stream is selected.
 
+        `paymentTokenSymbol` alone does not justify a receipt per transfer; it
+        is only filled in alongside the amount or address.
+        """
+        return self.payment_logs_selected or any(
+            self.is_property_selected(name)
+            for name in ("paymentTokenAddress", "paymentTokenAmount")
+        )
 
-    """
+    @property
+    def payment_logs_selected(self) -> bool:
+        """Return True if a child stream consumes the per-log payment detail."""
+        return any(child.selected for child in self.child_streams)
+
+    @property
+    def rpc_pool(self) -> RpcPool:
+        """Return the Polygon JSON-RPC pool built from the tap settings."""
+        if getattr(self, "_rpc_pool", None) is None:
+            urls = self.config.get("polygon_rpc_urls")
+            if urls:
+                self._rpc_pool = RpcPool(
+                    urls,
+                    timeout=self.config.get("rpc_timeout") or DEFAULT_TIMEOUT,
+                    hedge_after=self.config.get("rpc_hedge_after"),
+                )
+            else:
+                self._rpc_pool = default_rpc_pool
+        return self._rpc_pool
+
+    @property
+    def token_metadata(self) -> TokenMetadataResolver:
+        """Return the ERC-20 metadata resolver, persisted to `token_metadata_cache`."""
+        if getattr(self, "_token_metadata", None) is None:
+            self._token_metadata = TokenMetadataResolver(
+                self.rpc_pool, self.config.get("token_metadata_cache")
+            )
+            self._recorded_tokens: Set[str] = set()
+        return self._token_metadata
+
+    def get_token_metadata(self, addresses: List[str]) -> Dict[str, dict]:
+        """Resolve token metadata, recording or replaying it if configured."""
+        cassette = self.cassette
+        if cassette and cassette.replaying:
+            return {address: cassette.replay("token", address) for address in addresses}
+        metadata = self.token_metadata.resolve(addresses)
+        if cassette:
+            for address in set(metadata) - self._recorded_tokens:
+                cassette.record("token", address, metadata[address])
+                self._recorded_tokens.add(address)
+        return metadata
+
+    def get_receipt(self, transaction_id: str) -> dict:
+        """Fetch a transaction receipt, recording or replaying it if configured."""
+        cassette = self.cassette
+        if cassette and cassette.replaying:
+            return cassette.replay("receipt", transaction_id)
+        receipt = getReceipts(transaction_id, self.rpc_pool)
+        if cassette:
+            cassette.record("receipt", transaction_id, receipt)
+        return receipt
 
     def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
-        for record in self.request_records(context):
-            revenueData = getSecondaryRevenue(record["id"])
-            record["paymentTokenAddress"] = revenueData["paymentTokenAddress"]
-            record["paymentTokenAmount"] = revenueData["paymentTokenAmount"]
-            transformed_record = self.post_process(record, context)
-            if transformed_record is None:
-                # Record filtered out during post_process()
-                continue
-            yield transformed_record
+        needs_receipts = self.needs_receipts
+        payment_logs_selected = self.payment_logs_selected
+        self._payment_logs: Dict[str, List[dict]] = {}
+        for child in self.child_streams:
+            child.payment_logs = self._payment_logs
+        try:
+            for record in self.request_records(context):
+                if needs_receipts:
+                    with profiler.span(self.name, "enrich"):
+                        paymentLogs = getPaymentLogs(self.get_receipt(record["id"]))
+                        tokens = {log["paymentTokenAddress"] for log in paymentLogs}
+                        tokens.discard(None)
+                        scalePaymentLogs(paymentLogs, self.get_token_metadata(sorted(tokens)))
+                        revenueData = summarizePaymentLogs(paymentLogs)
+                    if payment_logs_selected:
+                        self._payment_logs[record["id"]] = paymentLogs
+                    record["paymentTokenAddress"] = revenueData["paymentTokenAddress"]
+                    record["paymentTokenAmount"] = revenueData["paymentTokenAmount"]
+                    record["paymentTokenSymbol"] = revenueData["paymentTokenSymbol"]
+                with profiler.span(self.name, "post_process"):
+                    transformed_record = self.post_process(record, context)
+                if transformed_record is None:
+                    # Record filtered out during post_process()
+                    continue
+                yield transformed_record
+        finally:
+            self.close_cassette()
 
 
 
     def post_process(self, row: dict, context: Optional[dict] = None) -> dict:
         """Generate row id"""
         row['timestamp'] = int(row['timestamp'])
-        row['blockNumber'] = int(row['blockNumber'])
-        row['paymentTokenAmount'] = str(row['paymentTokenAmount'])
+        if 'blockNumber' in row:
+            row['blockNumber'] = int(row['blockNumber'])
 
         return row
 
@@ -368,10 +349,7 @@ class SecondaryRevenueICETransfer(TapDgIceStream):
 
     def get_child_context(self, record: dict, context: Optional[dict]) -> dict:
         """Return a context dictionary for child streams."""
-        return {
-            "transactionId": record['id'],
-            "value": record['value']
-        }
+        return {"transactionId": record['id']}
 
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
@@ -390,4 +368,42 @@ class SecondaryRevenueICETransfer(TapDgIceStream):
         )),
         th.Property("paymentTokenAddress", th.StringType),
         th.Property("paymentTokenAmount", th.StringType),
+        th.Property("paymentTokenSymbol", th.StringType),
+    ).to_dict()
+
+
+class SecondaryRevenuePaymentLogs(StreamMetricsMixin, Stream):
+    """One row per DG-wallet Transfer log of a secondary revenue transaction.
+
+    Rows come from the receipt the parent stream already fetched for the
+    transaction, so no extra RPC is made. The parent shares its per-transaction
+    logs through `payment_logs` and the child context only carries the
+    transaction id; the empty `state_partitioning_keys` keeps a single
+    bookmark instead of one per transaction.
+    """
+    name = "secondary_revenue_payment_logs"
+
+    parent_stream_type = SecondaryRevenueICETransfer
+    state_partitioning_keys: List[str] = []
+    primary_keys = ["transactionId", "logIndex"]
+    payment_logs: Dict[str, List[dict]] = {}
+
+    def get_records(self, context: Optional[dict]) -> Iterable[Dict[str, Any]]:
+        for paymentLog in self.payment_logs.pop(context["transactionId"], []):
+            yield {
+                "transactionId": context["transactionId"],
+                "logIndex": paymentLog["logIndex"],
+                "paymentTokenAddress": paymentLog["paymentTokenAddress"],
+                "paymentTokenAmount": format_amount(paymentLog["scaledAmount"]),
+                "paymentTokenSymbol": paymentLog["symbol"],
+                "paymentTokenDecimals": paymentLog["decimals"],
+            }
+
+    schema = th.PropertiesList(
+        th.Property("transactionId", th.StringType),
+        th.Property("logIndex", th.IntegerType),
+        th.Property("paymentTokenAddress", th.StringType),
+        th.Property("paymentTokenAmount", th.StringType),
+        th.Property("paymentTokenSymbol", th.StringType),
+        th.Property("paymentTokenDecimals", th.IntegerType),
     ).to_dict()
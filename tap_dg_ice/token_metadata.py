@@ -0,0 +1,110 @@
+"""ERC-20 decimals/symbol lookup, memoized in-process and on disk."""
+
+import json
+import logging
+from decimal import Decimal, localcontext
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from tap_dg_ice.rpc_pool import RpcError, RpcPool
+
+DECIMALS_SELECTOR = "0x313ce567"
+SYMBOL_SELECTOR = "0x95d89b41"
+DEFAULT_DECIMALS = 18
+
+
+def scale_amount(amount: int, decimals: int) -> Decimal:
+    """Return the raw integer `amount` as an exact decimal token amount."""
+    with localcontext() as context:
+        context.prec = 100
+        return Decimal(amount).scaleb(-decimals)
+
+
+def format_amount(amount: Decimal) -> str:
+    """Format a token amount without exponent or trailing zeros."""
+    with localcontext() as context:
+        context.prec = 100
+        return format(amount.normalize(), "f")
+
+
+def decode_uint(result: Optional[str]) -> Optional[int]:
+    """Decode an ABI-encoded uint256 `eth_call` result."""
+    if not result or result == "0x":
+        return None
+    return int(result, 16)
+
+
+def decode_string(result: Optional[str]) -> Optional[str]:
+    """Decode an ABI-encoded string, or a bytes32 as used by some old tokens."""
+    if not result or result == "0x":
+        return None
+    data = bytes.fromhex(result[2:])
+    if len(data) >= 64 and int.from_bytes(data[:32], "big") == 32:
+        length = int.from_bytes(data[32:64], "big")
+        raw = data[64:64 + length]
+    else:
+        raw = data[:32].rstrip(b"\x00")
+    return raw.decode("utf-8", errors="replace") or None
+
+
+class TokenMetadataResolver:
+    """Resolve `decimals()` and `symbol()` once per token contract.
+
+    Unknown tokens are looked up with a single JSON-RPC batch of `eth_call`s;
+    results are kept in memory and, when `cache_path` is set, in a JSON file
+    so later runs start warm. Contracts whose `decimals()` returns `0x` or
+    reverts, i.e. that do not implement it, are treated as having 18
+    decimals. A failed lookup raises `RpcError` and caches nothing, so the
+    token is looked up again next time.
+    """
+
+    def __init__(self, rpc_pool: RpcPool, cache_path: Optional[Path] = None) -> None:
+        self.rpc_pool = rpc_pool
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.logger = logging.getLogger(__name__)
+        self._metadata: Dict[str, dict] = self._load()
+
+    def resolve(self, addresses: Iterable[str]) -> Dict[str, dict]:
+        """Return `{address: {"decimals", "symbol"}}` for the given addresses."""
+        wanted = {address.lower(): address for address in addresses if address}
+        missing = [key for key in wanted if key not in self._metadata]
+        if missing:
+            self._fetch(missing)
+        return {address: self._metadata[key] for key, address in wanted.items()}
+
+    def _fetch(self, addresses: list) -> None:
+        calls = []
+        for address in addresses:
+            for selector in (DECIMALS_SELECTOR, SYMBOL_SELECTOR):
+                call = {"to": address, "data": selector}
+                calls.append(("eth_call", [call, "latest"]))
+        results = self.rpc_pool.batch(calls)
+        if len(results) != len(calls):
+            raise RpcError(f"Expected {len(calls)} results, got {len(results)}")
+        fetched = {}
+        for index, address in enumerate(addresses):
+            decimals = decode_uint(results[2 * index])
+            if decimals is None:
+                self.logger.warning(f"Token {address} has no decimals(), assuming 18.")
+                decimals = DEFAULT_DECIMALS
+            fetched[address] = {
+                "decimals": decimals,
+                "symbol": decode_string(results[2 * index + 1]),
+            }
+        self._metadata.update(fetched)
+        self._save()
+
+    def _load(self) -> Dict[str, dict]:
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        with open(self.cache_path) as cache_file:
+            return json.load(cache_file)
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = self.cache_path.with_suffix(".tmp")
+        with open(temporary_path, "w") as cache_file:
+            json.dump(self._metadata, cache_file, indent=2, sort_keys=True)
+        temporary_path.replace(self.cache_path)